@@ -0,0 +1,131 @@
+"""
+Token-bucket admission control for the ingest endpoints.
+
+Every reading must take a token from its device's bucket and from the global
+bucket. Low-priority readings (idle devices) are shed first: they may not
+dip into the last LOW_PRIORITY_RESERVE of the global burst, which stays
+available for active CPR. SOS/emergency traffic is never limited.
+
+Limits are per worker process. The global rate and burst are divided by
+WEB_CONCURRENCY (the worker count uvicorn reads) so the host-wide total
+matches the configuration. Per-device limits are not: a device on one
+keep-alive connection sends every reading to the same worker, so each
+worker enforces the full per-device rate. A device whose readings are
+spread over several workers (reconnecting on every request, as in a
+reconnect storm) is therefore admitted up to WEB_CONCURRENCY times
+INGEST_DEVICE_RATE; the global limit still caps the host as a whole.
+"""
+
+import math
+import os
+import time
+from collections import OrderedDict
+
+PRIORITY_EMERGENCY = "emergency"
+PRIORITY_NORMAL = "normal"
+PRIORITY_LOW = "low"
+
+LOW_PRIORITY_RESERVE = 0.2
+
+
+class TokenBucket:
+    __slots__ = ("rate", "burst", "tokens", "updated")
+
+    def __init__(self, rate, burst, now=None):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic() if now is None else now
+
+    def refill(self, now):
+        if now > self.updated:
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+
+    def wait_time(self, floor=0.0):
+        """Seconds until a token is available above floor"""
+        missing = floor + 1 - self.tokens
+        return max(0.0, missing / self.rate) if self.rate > 0 else math.inf
+
+
+class AdmissionController:
+    def __init__(self, device_rate, device_burst, global_rate, global_burst, max_devices=100000):
+        self.device_rate = device_rate
+        self.device_burst = device_burst
+        self.global_bucket = TokenBucket(global_rate, global_burst)
+        self.max_devices = max_devices
+        self._devices = OrderedDict()
+        self.admitted = {PRIORITY_EMERGENCY: 0, PRIORITY_NORMAL: 0, PRIORITY_LOW: 0}
+        self.rejected = {PRIORITY_NORMAL: 0, PRIORITY_LOW: 0}
+
+    @classmethod
+    def from_env(cls):
+        workers = max(1, int(os.environ.get("WEB_CONCURRENCY", 1)))
+        return cls(
+            device_rate=float(os.environ.get("INGEST_DEVICE_RATE", 20)),
+            device_burst=max(1.0, float(os.environ.get("INGEST_DEVICE_BURST", 40))),
+            global_rate=float(os.environ.get("INGEST_GLOBAL_RATE", 2000)) / workers,
+            global_burst=max(1.0, float(os.environ.get("INGEST_GLOBAL_BURST", 4000)) / workers),
+        )
+
+    def _device_bucket(self, device_id, now):
+        bucket = self._devices.get(device_id)
+        if bucket is None:
+            bucket = TokenBucket(self.device_rate, self.device_burst, now)
+            self._devices[device_id] = bucket
+            if len(self._devices) > self.max_devices:
+                self._devices.popitem(last=False)
+        else:
+            self._devices.move_to_end(device_id)
+        return bucket
+
+    def admit(self, device_id, priority=PRIORITY_NORMAL):
+        """Take tokens for one reading; returns None if admitted, else seconds to wait"""
+        if priority == PRIORITY_EMERGENCY:
+            self.admitted[priority] += 1
+            return None
+
+        now = time.monotonic()
+        device = self._device_bucket(device_id, now)
+        device.refill(now)
+        self.global_bucket.refill(now)
+
+        floor = self.global_bucket.burst * LOW_PRIORITY_RESERVE if priority == PRIORITY_LOW else 0.0
+        if device.tokens < 1 or self.global_bucket.tokens < floor + 1:
+            self.rejected[priority] += 1
+            return max(device.wait_time(), self.global_bucket.wait_time(floor))
+
+        device.tokens -= 1
+        self.global_bucket.tokens -= 1
+        self.admitted[priority] += 1
+        return None
+
+    def load(self):
+        """Fraction of the global burst in use (0 idle .. 1 saturated)"""
+        self.global_bucket.refill(time.monotonic())
+        return 1.0 - self.global_bucket.tokens / self.global_bucket.burst
+
+
+def reading_priority(reading):
+    """Priority of a legacy reading (SensorDataCreate)"""
+    if reading.sos_triggered:
+        return PRIORITY_EMERGENCY
+    if reading.compression_rate > 0:
+        return PRIORITY_NORMAL
+    return PRIORITY_LOW
+
+
+def _section(data, name):
+    section = data.get(name) if isinstance(data, dict) else None
+    return section if isinstance(section, dict) else {}
+
+
+def device_payload_priority(data):
+    """Priority of a sectioned device payload (malformed sections are left to the handler)"""
+    if _section(data, "status").get("sos_triggered"):
+        return PRIORITY_EMERGENCY
+    try:
+        compressing = float(_section(data, "cpr").get("compression_rate") or 0) > 0
+    except (TypeError, ValueError):
+        compressing = False
+    return PRIORITY_NORMAL if compressing else PRIORITY_LOW
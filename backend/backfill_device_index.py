@@ -0,0 +1,60 @@
+"""
+One-off backfill of sensor_by_device from existing sensor_data.
+
+    python backfill_device_index.py [--start-after KEY]
+
+New readings are indexed on ingest; this copies readings written before the
+index existed. Push-id readings keep their key, uuid4 readings get a time
+prefix (see ingest.device_index_key) so every device's index is in time
+order. The index is written in each device's shard (see layout.py).
+Writes are idempotent multi-path updates, so the command can be
+re-run or resumed from the last key it printed.
+"""
+
+import argparse
+
+from export import record_time_ms
+from firebase_admin_config import firebase_db
+from ingest import device_index_key, is_push_id, push_id_time
+from layout import layout
+from streaming import iter_children
+
+PAGE_SIZE = 1000
+WRITE_BATCH = 500
+
+
+def backfill(start_after=None):
+    """Index every reading after start_after; returns (indexed, skipped)"""
+    root = firebase_db.reference("/")
+    updates, indexed, skipped, last_key = {}, 0, 0, start_after
+
+    for key, record in iter_children("sensor_data", PAGE_SIZE, start_after=start_after):
+        last_key = key
+        device_id = record.get("device_id") if isinstance(record, dict) else None
+        millis = push_id_time(key) if is_push_id(key) else record_time_ms(record or {})
+        if not device_id or millis is None:
+            skipped += 1
+            continue
+        updates[layout.readings_path(device_id, device_index_key(key, millis))] = record
+        indexed += 1
+
+        if len(updates) >= WRITE_BATCH:
+            root.update(updates)
+            updates = {}
+            print(f"   {indexed} readings indexed (resume with --start-after {last_key})")
+    if updates:
+        root.update(updates)
+    return indexed, skipped
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build sensor_by_device from existing sensor_data")
+    parser.add_argument("--start-after", default=None, help="resume after this sensor_data key")
+    args = parser.parse_args()
+
+    try:
+        indexed, skipped = backfill(args.start_after)
+        print(f"✅ Indexed {indexed} readings ({skipped} without device_id or timestamp skipped)")
+    except Exception as e:
+        print(f"❌ Backfill failed: {e}")
+        raise SystemExit(1)
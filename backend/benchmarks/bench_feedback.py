@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""
+Throughput benchmark: sliding-window CPR feedback across many concurrent devices.
+
+Feeds interleaved 10 Hz samples (SEND_INTERVAL in esp32/config.h) from N
+devices through CPRFeedback.update and reports samples/s and the per-sample
+cost, which must stay flat as devices and window length grow.
+
+    python backend/benchmarks/bench_feedback.py [devices] [seconds_of_cpr]
+"""
+
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from feedback import CPRFeedback  # noqa: E402
+
+SAMPLE_INTERVAL = 0.1
+
+
+def make_samples(devices, seconds):
+    rng = random.Random(42)
+    ticks = int(seconds / SAMPLE_INTERVAL)
+    return [
+        (f"esp32-{d:05d}", tick * SAMPLE_INTERVAL, rng.uniform(90, 130), rng.uniform(3.5, 7.0), rng.uniform(0, 2.0))
+        for tick in range(ticks)
+        for d in range(devices)
+    ]
+
+
+def run(devices, seconds):
+    samples = make_samples(devices, seconds)
+    feedback = CPRFeedback()
+    cues = 0
+    start = time.perf_counter()
+    for device_id, now, rate, depth, pressure in samples:
+        result = feedback.update(device_id, rate, depth, pressure, now=now)
+        if result is not None and result["cues"]:
+            cues += 1
+    elapsed = time.perf_counter() - start
+    return len(samples), elapsed, cues
+
+
+def main():
+    devices = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    seconds = float(sys.argv[2]) if len(sys.argv) > 2 else 30
+    for count in (devices // 10 or 1, devices):
+        total, elapsed, cues = run(count, seconds)
+        print(f"{count:>6} devices: {total / elapsed:>10,.0f} samples/s "
+              f"({elapsed / total * 1e6:.2f} us/sample, {cues} samples with cues)")
+    print(f"  budget: {devices / SAMPLE_INTERVAL:,.0f} samples/s for {devices} devices at 10 Hz")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Microbenchmark: per-reading CPU cost of POST /api/iot/sensor-data.
+
+Compares the original pipeline (SensorData copy, uuid4, model_dump, response_model
+re-serialization) with the lean ingest path. Firebase writes go to a null sink
+that only JSON-encodes the record, so the numbers are pure server CPU.
+
+    python backend/benchmarks/bench_ingest.py [iterations]
+"""
+
+import json
+import sys
+import timeit
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from firebase_admin_config import firebase_db
+
+
+class _NullRef:
+    def set(self, value):
+        json.dumps(value, default=str)
+
+
+firebase_db.reference = lambda path="/": _NullRef()
+
+import server  # noqa: E402
+from fastapi.encoders import jsonable_encoder  # noqa: E402
+from fast_json import dumps  # noqa: E402
+from ingest import sensor_record  # noqa: E402
+
+BODY = json.dumps({
+    "device_id": "esp32-cpr-001",
+    "compression_rate": 110.5,
+    "compression_depth": 5.4,
+    "pressure": 1.25,
+    "acceleration_x": 0.12,
+    "acceleration_y": -0.4,
+    "acceleration_z": -9.1,
+    "proximity": 0.42,
+    "quality_score": 0.93,
+}).encode()
+
+
+def legacy_ingest():
+    data = server.SensorDataCreate.model_validate(json.loads(BODY))
+    sensor_data = server.SensorData(**data.model_dump())
+    firebase_db.reference(f"sensor_data/{sensor_data.id}").set(sensor_data.model_dump())
+    # response_model: validate the return value again, then encode it
+    response = server.SensorData.model_validate(sensor_data.model_dump())
+    return json.dumps(jsonable_encoder(response))
+
+
+def lean_ingest():
+    data = server.SensorDataCreate.model_validate_json(BODY)
+    reading_id, record = sensor_record(data)
+    firebase_db.reference(f"sensor_data/{reading_id}").set(record)
+    return dumps({"status": "success", "id": reading_id, "timestamp": record["timestamp"]})
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    results = {}
+    for name, fn in (("legacy", legacy_ingest), ("lean", lean_ingest)):
+        best = min(timeit.repeat(fn, number=iterations, repeat=5))
+        results[name] = best / iterations * 1e6
+        print(f"{name:>8}: {results[name]:7.2f} us/reading")
+    print(f" speedup: {results['legacy'] / results['lean']:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -18,7 +18,7 @@ def clear_database():
         initialize_firebase()
         print("✅ Firebase initialized.")
 
-        nodes_to_clear = ['users', 'emergencies', 'sessions', 'sensor_data', 'system_health']
+        nodes_to_clear = ['users', 'emergencies', 'sessions', 'sensor_data', 'sensor_by_device', 'shards', 'shard_directory', 'system_health']
         
         for node in nodes_to_clear:
             try:
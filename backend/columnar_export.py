@@ -0,0 +1,235 @@
+"""
+Columnar (Parquet) snapshots of sensor_data and sessions for offline analysis.
+
+    python columnar_export.py --out exports/
+
+Files are Hive-partitioned by device and day so analysts can load a slice
+with pyarrow/pandas/duckdb without touching the rest:
+
+    exports/sensor_data/device_id=<id>/date=<YYYY-MM-DD>/part-<run>-<n>.parquet
+    exports/sessions/device_id=<id>/date=<YYYY-MM-DD>/part-<run>.parquet
+
+Readings are exported incrementally from every device's time-ordered
+sensor_by_device index (in its shard, see layout.py): the last exported key
+of each device is kept in exports/_export_state.json and the next run only
+reads readings after it. Index keys sort in time order whatever key the
+reading was stored under (uuid4 readings get a time prefix, see
+backfill_device_index.py), so a cursor never skips later readings.
+Sessions are mutable (status, end_time, totals), so they are re-snapshotted
+on every run; the node is small next to the readings.
+"""
+
+import argparse
+import json
+import re
+import shutil
+import time
+from collections import defaultdict
+from datetime import datetime, timezone
+from pathlib import Path
+
+from export import parse_time_bound, record_time_ms
+from ingest import is_push_id
+from layout import READINGS, SESSIONS, child_keys, layout
+from streaming import iter_children
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # optional dependency
+    pa = pq = None
+
+STATE_FILE = "_export_state.json"
+FLUSH_ROWS = 50000
+PAGE_SIZE = 1000
+
+
+def _schemas():
+    timestamp = pa.timestamp("ms", tz="UTC")
+    sensor_data = pa.schema([
+        ("id", pa.string()),
+        ("device_id", pa.string()),
+        ("timestamp", timestamp),
+        ("compression_rate", pa.float64()),
+        ("compression_depth", pa.float64()),
+        ("pressure", pa.float64()),
+        ("acceleration_x", pa.float64()),
+        ("acceleration_y", pa.float64()),
+        ("acceleration_z", pa.float64()),
+        ("proximity", pa.float64()),
+        ("quality_score", pa.float64()),
+        ("temperature", pa.float64()),
+        ("humidity", pa.float64()),
+        ("altitude", pa.float64()),
+        ("gesture", pa.int32()),
+        ("sos_triggered", pa.bool_()),
+    ])
+    sessions = pa.schema([
+        ("id", pa.string()),
+        ("device_id", pa.string()),
+        ("start_time", timestamp),
+        ("end_time", timestamp),
+        ("duration", pa.int64()),
+        ("total_compressions", pa.int64()),
+        ("average_rate", pa.float64()),
+        ("average_depth", pa.float64()),
+        ("quality_score", pa.float64()),
+        ("location", pa.string()),
+        ("status", pa.string()),
+    ])
+    return sensor_data, sessions
+
+
+def _partition_value(value):
+    return re.sub(r"[^A-Za-z0-9_.-]", "_", str(value or "unknown"))
+
+
+def _to_datetime(value):
+    if value is None:
+        return None
+    if isinstance(value, (int, float)):
+        millis = int(value)
+    else:
+        try:
+            millis = parse_time_bound(str(value))
+        except ValueError:
+            return None
+    return datetime.fromtimestamp(millis / 1000, timezone.utc)
+
+
+def _typed_row(record, schema):
+    """Coerce a Firebase record to the column types, dropping fields outside the schema"""
+    row = {}
+    for field in schema:
+        value = record.get(field.name)
+        if value is not None:
+            try:
+                if pa.types.is_timestamp(field.type):
+                    value = _to_datetime(value)
+                elif pa.types.is_floating(field.type):
+                    value = float(value)
+                elif pa.types.is_integer(field.type):
+                    value = int(value)
+                elif pa.types.is_boolean(field.type):
+                    value = bool(value)
+                else:
+                    value = str(value)
+            except (TypeError, ValueError):
+                value = None
+        row[field.name] = value
+    return row
+
+
+def _write_partitions(out_dir, table_name, buffers, schema, file_name):
+    written = 0
+    for (device_id, day), rows in buffers.items():
+        partition = out_dir / table_name / f"device_id={_partition_value(device_id)}" / f"date={day}"
+        partition.mkdir(parents=True, exist_ok=True)
+        table = pa.Table.from_pylist(rows, schema=schema)
+        pq.write_table(table, partition / file_name, compression="zstd")
+        written += len(rows)
+    buffers.clear()
+    return written
+
+
+def _load_state(out_dir):
+    path = out_dir / STATE_FILE
+    return json.loads(path.read_text()) if path.exists() else {}
+
+
+def _save_state(out_dir, state):
+    path = out_dir / STATE_FILE
+    tmp = path.with_suffix(".tmp")
+    tmp.write_text(json.dumps(state, indent=2))
+    tmp.replace(path)
+
+
+def _new_readings(state):
+    """Yield (key, record) of readings not exported yet, advancing the cursors in state"""
+    cursors = state.setdefault("device_cursors", {})
+    # Exports made from sensor_data kept one global key; push ids are the same
+    # keys in the index, so it still marks what every device already exported
+    legacy = state.get("sensor_data_cursor")
+    default = legacy if legacy and is_push_id(legacy) else None
+    for index in layout.collection_paths(READINGS):
+        for device_id in child_keys(index):
+            start_after = cursors.get(device_id, default)
+            for key, record in iter_children(f"{index}/{device_id}", PAGE_SIZE, start_after=start_after):
+                cursors[device_id] = key
+                yield key, record
+
+
+def export_sensor_data(out_dir, state, run_id, flush_rows=FLUSH_ROWS):
+    """Append readings newer than the saved cursors; returns rows written"""
+    schema, _ = _schemas()
+    buffers = defaultdict(list)
+    pending = written = part = 0
+
+    for key, record in _new_readings(state):
+        if not isinstance(record, dict):
+            continue
+        row = _typed_row({"id": key, **record}, schema)
+        millis = record_time_ms(record)
+        day = datetime.fromtimestamp(millis / 1000, timezone.utc).date().isoformat() if millis else "unknown"
+        buffers[(row["device_id"], day)].append(row)
+        pending += 1
+
+        if pending >= flush_rows:
+            written += _write_partitions(out_dir, "sensor_data", buffers, schema, f"part-{run_id}-{part}.parquet")
+            part += 1
+            pending = 0
+            # Commit progress after every flush so an interrupted run resumes without duplicates
+            _save_state(out_dir, state)
+
+    written += _write_partitions(out_dir, "sensor_data", buffers, schema, f"part-{run_id}-{part}.parquet")
+    return written
+
+
+def export_sessions(out_dir, run_id):
+    """Rewrite the sessions snapshot; returns rows written"""
+    _, schema = _schemas()
+    buffers = defaultdict(list)
+    for key, record in layout.iter_collection(SESSIONS, PAGE_SIZE):
+        if not isinstance(record, dict):
+            continue
+        row = _typed_row({"id": key, **record}, schema)
+        day = row["start_time"].date().isoformat() if row["start_time"] else "unknown"
+        buffers[(row["device_id"], day)].append(row)
+
+    staging = out_dir / f"sessions.{run_id}"
+    written = _write_partitions(staging, "sessions", buffers, schema, f"part-{run_id}.parquet")
+    target = out_dir / "sessions"
+    if target.exists():
+        shutil.rmtree(target)
+    if (staging / "sessions").exists():
+        (staging / "sessions").replace(target)
+    shutil.rmtree(staging, ignore_errors=True)
+    return written
+
+
+def run_export(out_dir):
+    if pa is None:
+        raise RuntimeError("Columnar export requires pyarrow (pip install pyarrow)")
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    state = _load_state(out_dir)
+    run_id = int(time.time())
+
+    readings = export_sensor_data(out_dir, state, run_id)
+    sessions = export_sessions(out_dir, run_id)
+    state["last_run"] = datetime.now(timezone.utc).isoformat()
+    _save_state(out_dir, state)
+    return readings, sessions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export sensor_data and sessions to partitioned Parquet")
+    parser.add_argument("--out", default="exports", help="output directory (default: exports)")
+    args = parser.parse_args()
+
+    try:
+        readings, sessions = run_export(args.out)
+        print(f"✅ Exported {readings} new readings and {sessions} sessions to {args.out}")
+    except Exception as e:
+        print(f"❌ Export failed: {e}")
+        raise SystemExit(1)
@@ -0,0 +1,83 @@
+"""
+Conditional GET support (ETag / Last-Modified) for slowly-changing reads.
+
+The validator for a resource is the hash of the JSON we last served for it.
+Write handlers invalidate the resource (and tell the other workers through
+the event bus); until then, or until the validator is older than the TTL,
+a request carrying a matching If-None-Match / If-Modified-Since gets a 304
+straight from memory without touching Firebase. The TTL bounds staleness
+for writes that bypass the API (the web app and firmware write to Firebase
+directly).
+"""
+
+import hashlib
+import time
+from email.utils import formatdate, parsedate_to_datetime
+
+from starlette.responses import Response
+
+from fast_json import FastJSONResponse, dumps
+
+
+class ConditionalCache:
+    def __init__(self, ttl_seconds=30, max_resources=10000):
+        self.ttl_seconds = ttl_seconds
+        self.max_resources = max_resources
+        # resource -> {variant: (etag, last_modified, stored_at)}
+        self._validators = {}
+        self.not_modified = 0
+
+    def invalidate(self, resource):
+        """Forget every validator of a resource after it was written"""
+        self._validators.pop(resource, None)
+
+    def _lookup(self, resource, variant):
+        entry = self._validators.get(resource, {}).get(variant)
+        if entry is None or time.monotonic() - entry[2] > self.ttl_seconds:
+            return None
+        return entry
+
+    def _is_fresh(self, request, etag, last_modified):
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match is not None:
+            tags = [tag.strip() for tag in if_none_match.split(",")]
+            return "*" in tags or etag in tags
+        if_modified_since = request.headers.get("if-modified-since")
+        if if_modified_since:
+            try:
+                return int(last_modified) <= parsedate_to_datetime(if_modified_since).timestamp()
+            except (TypeError, ValueError):
+                return False
+        return False
+
+    def _headers(self, etag, last_modified):
+        return {
+            "ETag": etag,
+            "Last-Modified": formatdate(last_modified, usegmt=True),
+            "Cache-Control": "no-cache",
+        }
+
+    def not_modified_response(self, request, resource, variant=""):
+        """304 response when the client's copy is still current, else None"""
+        entry = self._lookup(resource, variant)
+        if entry is None or not self._is_fresh(request, entry[0], entry[1]):
+            return None
+        self.not_modified += 1
+        return Response(status_code=304, headers=self._headers(entry[0], entry[1]))
+
+    def respond(self, request, resource, data, variant=""):
+        """Serve freshly read data with validators (304 if it matches the client's copy)"""
+        body = dumps(data)
+        etag = 'W/"' + hashlib.blake2b(body, digest_size=12).hexdigest() + '"'
+
+        entry = self._validators.get(resource, {}).get(variant)
+        last_modified = entry[1] if entry is not None and entry[0] == etag else time.time()
+        if len(self._validators) >= self.max_resources and resource not in self._validators:
+            self._validators.pop(next(iter(self._validators)))
+        self._validators.setdefault(resource, {})[variant] = (etag, last_modified, time.monotonic())
+
+        headers = self._headers(etag, last_modified)
+        if self._is_fresh(request, etag, last_modified):
+            self.not_modified += 1
+            return Response(status_code=304, headers=headers)
+        return FastJSONResponse(body, headers=headers)
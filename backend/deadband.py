@@ -0,0 +1,83 @@
+"""
+Deadband suppression for slowly-varying device state.
+
+A section (environment, status) is only rewritten when one of its fields
+moved further than its deadband from the last value written, when a
+non-numeric field changed at all, or when the keep-alive interval passed.
+Timestamps are ignored for the comparison.
+
+Deadbands can be overridden with DEVICE_DEADBANDS, e.g.
+"temperature=0.5,humidity=2", and the keep-alive with
+DEADBAND_KEEPALIVE_SECONDS.
+"""
+
+import os
+import time
+from collections import OrderedDict
+
+DEFAULT_DEADBANDS = {
+    "temperature": 0.2,    # °C
+    "humidity": 1.0,       # %RH
+    "pressure": 0.5,       # hPa
+    "altitude": 1.0,       # m
+    "battery_level": 1,    # %
+    "wifi_signal": 3,      # dBm
+}
+
+IGNORED_FIELDS = ("timestamp", "last_update")
+
+
+def deadbands_from_env():
+    deadbands = dict(DEFAULT_DEADBANDS)
+    for item in os.environ.get("DEVICE_DEADBANDS", "").split(","):
+        name, _, value = item.partition("=")
+        if name.strip() and value.strip():
+            deadbands[name.strip()] = float(value)
+    return deadbands
+
+
+class DeadbandFilter:
+    def __init__(self, deadbands=None, keepalive_seconds=30.0, max_entries=200000):
+        self.deadbands = DEFAULT_DEADBANDS if deadbands is None else deadbands
+        self.keepalive_seconds = keepalive_seconds
+        self.max_entries = max_entries
+        self._last = OrderedDict()
+        self.written = 0
+        self.suppressed = 0
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            deadbands=deadbands_from_env(),
+            keepalive_seconds=float(os.environ.get("DEADBAND_KEEPALIVE_SECONDS", 30)),
+        )
+
+    def _changed(self, previous, values):
+        for name, value in values.items():
+            if name in IGNORED_FIELDS:
+                continue
+            old = previous.get(name)
+            band = self.deadbands.get(name)
+            if band is not None and isinstance(value, (int, float)) and isinstance(old, (int, float)) \
+                    and not isinstance(value, bool):
+                if abs(value - old) >= band:
+                    return True
+            elif value != old:
+                return True
+        return False
+
+    def should_write(self, device_id, section, values, now=None):
+        """True when values differ enough from the last write (which is then remembered)"""
+        now = time.monotonic() if now is None else now
+        key = (device_id, section)
+        entry = self._last.get(key)
+        if entry is not None and now - entry[0] < self.keepalive_seconds and not self._changed(entry[1], values):
+            self.suppressed += 1
+            return False
+
+        self._last[key] = (now, values)
+        self._last.move_to_end(key)
+        if len(self._last) > self.max_entries:
+            self._last.popitem(last=False)
+        self.written += 1
+        return True
@@ -0,0 +1,129 @@
+"""
+Rolling statistics for environment readings, updated in O(1) per sample.
+
+For every device and field the engine keeps:
+
+- Welford running mean/variance over all samples seen,
+- an exponentially weighted mean/variance (EWMA) tracking recent conditions,
+- min/max over the last window_seconds from monotonic deques (amortized
+  O(1); only samples that can still become the extreme are kept).
+
+A sample is flagged anomalous when it is more than z_threshold exponentially
+weighted standard deviations from the EWMA (after min_samples samples).
+Raw samples are not stored.
+"""
+
+import math
+import os
+import time
+from collections import OrderedDict, deque
+
+ENV_FIELDS = ("temperature", "humidity", "pressure", "altitude")
+# In legacy readings "pressure" is the CPR compression pressure, not barometric
+LEGACY_ENV_FIELDS = ("temperature", "humidity", "altitude")
+
+
+class RollingStat:
+    __slots__ = ("count", "mean", "m2", "ewma", "ewvar", "last", "z", "_min", "_max")
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.ewma = None
+        self.ewvar = 0.0
+        self.last = None
+        self.z = 0.0
+        self._min = deque()     # (time, value), increasing values
+        self._max = deque()     # (time, value), decreasing values
+
+    def add(self, value, now, alpha, window):
+        # Score against the state before this sample
+        if self.ewma is not None and self.ewvar > 0:
+            self.z = (value - self.ewma) / math.sqrt(self.ewvar)
+        else:
+            self.z = 0.0
+
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+
+        if self.ewma is None:
+            self.ewma = value
+        else:
+            diff = value - self.ewma
+            increment = alpha * diff
+            self.ewma += increment
+            self.ewvar = (1 - alpha) * (self.ewvar + diff * increment)
+
+        while self._min and self._min[-1][1] >= value:
+            self._min.pop()
+        self._min.append((now, value))
+        while self._max and self._max[-1][1] <= value:
+            self._max.pop()
+        self._max.append((now, value))
+        cutoff = now - window
+        while self._min[0][0] < cutoff:
+            self._min.popleft()
+        while self._max[0][0] < cutoff:
+            self._max.popleft()
+        self.last = value
+
+    def snapshot(self, z_threshold, min_samples):
+        variance = self.m2 / (self.count - 1) if self.count > 1 else 0.0
+        return {
+            "count": self.count,
+            "last": self.last,
+            "mean": round(self.mean, 4),
+            "std": round(math.sqrt(variance), 4),
+            "ewma": round(self.ewma, 4),
+            "ew_std": round(math.sqrt(self.ewvar), 4),
+            "window_min": self._min[0][1],
+            "window_max": self._max[0][1],
+            "z": round(self.z, 2),
+            "anomaly": self.count > min_samples and abs(self.z) > z_threshold,
+        }
+
+
+class EnvironmentStats:
+    def __init__(self, alpha=0.05, window_seconds=300.0, z_threshold=3.0, min_samples=30, max_devices=100000):
+        self.alpha = alpha
+        self.window_seconds = window_seconds
+        self.z_threshold = z_threshold
+        self.min_samples = min_samples
+        self.max_devices = max_devices
+        self._devices = OrderedDict()
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            alpha=float(os.environ.get("ENV_STATS_ALPHA", 0.05)),
+            window_seconds=float(os.environ.get("ENV_STATS_WINDOW_SECONDS", 300)),
+            z_threshold=float(os.environ.get("ENV_STATS_Z_THRESHOLD", 3)),
+        )
+
+    def add(self, device_id, values, now=None):
+        """Fold the environment fields present in values into the device's stats"""
+        now = time.monotonic() if now is None else now
+        stats = self._devices.get(device_id)
+        if stats is None:
+            stats = self._devices[device_id] = {}
+            if len(self._devices) > self.max_devices:
+                self._devices.popitem(last=False)
+        else:
+            self._devices.move_to_end(device_id)
+        for name in ENV_FIELDS:
+            value = values.get(name)
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                stat = stats.get(name)
+                if stat is None:
+                    stat = stats[name] = RollingStat()
+                stat.add(float(value), now, self.alpha, self.window_seconds)
+
+    def snapshot(self, device_id):
+        """Current stats per field, or None for a device with no environment samples"""
+        stats = self._devices.get(device_id)
+        if not stats:
+            return None
+        return {name: stat.snapshot(self.z_threshold, self.min_samples) for name, stat in stats.items()}
@@ -0,0 +1,254 @@
+"""
+Host-local publish/subscribe between uvicorn worker processes.
+
+Each worker binds a Unix datagram socket in a shared directory
+(EVENT_BUS_DIR, default <tmp>/resqpulse-bus-<hash of the app directory>, so
+separate checkouts on one host never share a bus) and publishes by sending one
+datagram to every other socket found there. No broker is involved: a
+worker that dies leaves a stale socket file, which the next sender unlinks.
+
+Events are delivered to in-process subscribers and handlers registered
+with on(). Each subscriber has a bounded buffer with its own overflow
+policy, so a stalled viewer never holds more than queue_size events:
+DROP_OLDEST keeps the newest events, CONFLATE keeps only the latest event
+per key (e.g. per emergency id). Where Unix sockets are unavailable the
+bus degrades to in-process delivery only.
+"""
+
+import asyncio
+import hashlib
+import logging
+import os
+import socket
+import tempfile
+import time
+from collections import OrderedDict, defaultdict, deque
+from pathlib import Path
+
+from fast_json import dumps, loads
+
+logger = logging.getLogger(__name__)
+
+# Linux default socket buffers comfortably hold datagrams this size
+MAX_DATAGRAM_BYTES = 64 * 1024
+PEER_REFRESH_SECONDS = 1.0
+
+DROP_OLDEST = "drop-oldest"
+CONFLATE = "conflate"
+POLICIES = (DROP_OLDEST, CONFLATE)
+
+
+class Subscription:
+    """Bounded buffer of one subscriber; get() waits for the next event"""
+
+    def __init__(self, bus, topic, maxsize, policy=DROP_OLDEST, key=None):
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown overflow policy {policy!r}")
+        self.bus = bus
+        self.topic = topic
+        self.maxsize = maxsize
+        self.policy = policy
+        self.key = key or (lambda data: None)
+        self._events = deque() if policy == DROP_OLDEST else OrderedDict()
+        self._ready = asyncio.Event()
+        self.dropped = 0
+        self.conflated = 0
+
+    def put(self, data):
+        if self.policy == DROP_OLDEST:
+            if len(self._events) >= self.maxsize:
+                self._events.popleft()
+                self.dropped += 1
+                self.bus.dropped += 1
+            self._events.append(data)
+        else:
+            key = self.key(data)
+            if key in self._events:
+                # An older value for the same key is superseded, not lost
+                del self._events[key]
+                self.conflated += 1
+                self.bus.conflated += 1
+            elif len(self._events) >= self.maxsize:
+                self._events.popitem(last=False)
+                self.dropped += 1
+                self.bus.dropped += 1
+            self._events[key] = data
+        self._ready.set()
+
+    def _pop(self):
+        if self.policy == DROP_OLDEST:
+            return self._events.popleft()
+        return self._events.popitem(last=False)[1]
+
+    async def get(self):
+        while not self._events:
+            self._ready.clear()
+            await self._ready.wait()
+        return self._pop()
+
+    def qsize(self):
+        return len(self._events)
+
+
+def default_bus_dir():
+    """Per-deployment bus directory; kept under <tmp> so socket paths stay short"""
+    app_dir = str(Path(__file__).resolve().parent)
+    return Path(tempfile.gettempdir()) / f"resqpulse-bus-{hashlib.sha1(app_dir.encode()).hexdigest()[:12]}"
+
+
+class EventBus:
+    def __init__(self, bus_dir=None, queue_size=256):
+        self.bus_dir = Path(bus_dir or os.environ.get('EVENT_BUS_DIR') or default_bus_dir())
+        self.queue_size = queue_size
+        self.path = None
+        self._subscribers = defaultdict(set)
+        self._handlers = defaultdict(list)
+        self._recv_sock = None
+        self._send_sock = None
+        self._peers = []
+        self._peers_at = 0.0
+        self.dropped = 0
+        self.conflated = 0
+
+    @property
+    def running(self):
+        return self._recv_sock is not None
+
+    # ============= LIFECYCLE =============
+
+    async def start(self):
+        """Bind this worker's socket and start receiving peer events"""
+        if self.running or not hasattr(socket, 'AF_UNIX'):
+            return
+        try:
+            self.bus_dir.mkdir(parents=True, exist_ok=True)
+            self.path = self.bus_dir / f"{os.getpid()}.sock"
+            if self.path.exists():
+                self.path.unlink()
+
+            recv_sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+            recv_sock.bind(str(self.path))
+            recv_sock.setblocking(False)
+            send_sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+            send_sock.setblocking(False)
+
+            loop = asyncio.get_running_loop()
+            loop.add_reader(recv_sock.fileno(), self._drain_socket)
+            self._recv_sock, self._send_sock = recv_sock, send_sock
+            logger.info(f"Event bus listening on {self.path}")
+        except OSError as e:
+            logger.warning(f"Event bus running in-process only: {e}")
+            self.path = None
+
+    async def stop(self):
+        """Stop receiving and remove this worker's socket"""
+        if not self.running:
+            return
+        asyncio.get_running_loop().remove_reader(self._recv_sock.fileno())
+        self._recv_sock.close()
+        self._send_sock.close()
+        self._recv_sock = self._send_sock = None
+        try:
+            self.path.unlink()
+        except OSError:
+            pass
+
+    # ============= SUBSCRIPTIONS =============
+
+    def subscribe(self, topic, policy=DROP_OLDEST, key=None, maxsize=None):
+        """Return a bounded Subscription receiving every event published on topic"""
+        subscription = Subscription(self, topic, maxsize or self.queue_size, policy, key)
+        self._subscribers[topic].add(subscription)
+        return subscription
+
+    def unsubscribe(self, topic, subscription):
+        subscribers = self._subscribers.get(topic)
+        if subscribers is not None:
+            subscribers.discard(subscription)
+            if not subscribers:
+                del self._subscribers[topic]
+
+    def stats(self):
+        """Subscriber and overflow counters for monitoring"""
+        subscriptions = [s for subscribers in self._subscribers.values() for s in subscribers]
+        return {
+            "topics": len(self._subscribers),
+            "subscribers": len(subscriptions),
+            "buffered": sum(s.qsize() for s in subscriptions),
+            "dropped": self.dropped,
+            "conflated": self.conflated,
+        }
+
+    def on(self, topic, handler):
+        """Call handler(data) for every event on topic ('device/*' matches a whole family), from any worker"""
+        self._handlers[topic].append(handler)
+
+    # ============= PUBLISHING =============
+
+    def publish(self, topic, data):
+        """Deliver an event to local subscribers and to every other worker"""
+        self._deliver(topic, data)
+        if self.running:
+            self._broadcast(dumps({"t": topic, "d": data}))
+
+    def _deliver(self, topic, data):
+        handlers = self._handlers.get(topic, [])
+        if '/' in topic:
+            handlers = handlers + self._handlers.get(topic.split('/', 1)[0] + '/*', [])
+        for handler in handlers:
+            try:
+                handler(data)
+            except Exception as e:
+                logger.error(f"Event bus handler error on {topic}: {e}")
+
+        for subscription in self._subscribers.get(topic, ()):
+            subscription.put(data)
+
+    def _broadcast(self, message):
+        if len(message) > MAX_DATAGRAM_BYTES:
+            logger.warning(f"Event bus message too large to share ({len(message)} bytes)")
+            return
+        for peer in self._current_peers():
+            try:
+                self._send_sock.sendto(message, peer)
+            except BlockingIOError:
+                # Peer isn't keeping up; drop rather than block the event loop
+                self.dropped += 1
+            except (ConnectionRefusedError, FileNotFoundError):
+                # Worker is gone; clean up its socket so nobody else tries it
+                try:
+                    os.unlink(peer)
+                except OSError:
+                    pass
+                self._peers_at = 0.0
+            except OSError as e:
+                logger.warning(f"Event bus send to {peer} failed: {e}")
+
+    def _current_peers(self):
+        now = time.monotonic()
+        if now - self._peers_at > PEER_REFRESH_SECONDS:
+            own = str(self.path)
+            try:
+                self._peers = [entry.path for entry in os.scandir(self.bus_dir)
+                               if entry.name.endswith('.sock') and entry.path != own]
+            except OSError:
+                self._peers = []
+            self._peers_at = now
+        return self._peers
+
+    # ============= RECEIVING =============
+
+    def _drain_socket(self):
+        while True:
+            try:
+                message = self._recv_sock.recv(MAX_DATAGRAM_BYTES)
+            except (BlockingIOError, InterruptedError):
+                return
+            except OSError as e:
+                logger.error(f"Event bus receive error: {e}")
+                return
+            try:
+                event = loads(message)
+                self._deliver(event["t"], event["d"])
+            except Exception as e:
+                logger.error(f"Malformed event bus message: {e}")
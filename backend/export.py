@@ -0,0 +1,102 @@
+"""
+Historical exports of sensor readings.
+
+Readings are paged out of the device's sensor_by_device index (in its
+shard) in key order and streamed row by row, so memory stays constant
+whatever the time range. Index keys encode their creation time, which turns
+from/to into a key range over that device only. Readings stored under
+uuid4 keys (before push ids) are indexed as a time prefix + the old key by
+backfill_device_index.py and are exported with that index key as their id;
+every row is still checked against its own timestamp.
+"""
+
+import csv
+import io
+from datetime import datetime, timezone
+
+from ingest import push_id_bound
+from layout import layout
+from streaming import iter_children
+
+# Column order for CSV exports (matches SensorData)
+EXPORT_FIELDS = (
+    "id",
+    "device_id",
+    "timestamp",
+    "compression_rate",
+    "compression_depth",
+    "pressure",
+    "acceleration_x",
+    "acceleration_y",
+    "acceleration_z",
+    "proximity",
+    "quality_score",
+    "temperature",
+    "humidity",
+    "altitude",
+    "gesture",
+    "sos_triggered",
+)
+
+
+def parse_time_bound(value):
+    """Parse an epoch-milliseconds or ISO-8601 query value into epoch ms"""
+    if value is None or value == "":
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        pass
+    moment = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return int(moment.timestamp() * 1000)
+
+
+def record_time_ms(record):
+    """Reading timestamp in epoch ms (stored as ISO text or epoch ms)"""
+    stamp = record.get("timestamp")
+    if isinstance(stamp, (int, float)):
+        return int(stamp)
+    if isinstance(stamp, str):
+        try:
+            return parse_time_bound(stamp)
+        except ValueError:
+            return None
+    return None
+
+
+def iter_device_readings(device_id, start_ms=None, end_ms=None, cursor=None, page_size=500):
+    """Yield a device's readings in key order, resuming after cursor (a reading id)"""
+    start_after = cursor
+    if start_ms is not None:
+        lower = push_id_bound(start_ms)
+        if start_after is None or start_after < lower:
+            # Start just before the first key that could fall in range
+            start_after = lower[:-1]
+    end_at = push_id_bound(end_ms, upper=True) if end_ms is not None else None
+
+    index = layout.readings_path(device_id)
+    for key, record in iter_children(index, page_size, start_after=start_after, end_at=end_at):
+        if not isinstance(record, dict):
+            continue
+        stamp = record_time_ms(record)
+        if stamp is not None:
+            if start_ms is not None and stamp < start_ms:
+                continue
+            if end_ms is not None and stamp > end_ms:
+                continue
+        yield {**record, "id": key}
+
+
+def csv_chunks(rows, fields=EXPORT_FIELDS):
+    """Encode rows as CSV with a header line, one row per chunk"""
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=fields, extrasaction="ignore")
+    writer.writeheader()
+    yield buffer.getvalue().encode("utf-8")
+    for row in rows:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerow(row)
+        yield buffer.getvalue().encode("utf-8")
@@ -0,0 +1,63 @@
+"""
+Fast JSON encoding for API responses and SSE events.
+
+Uses orjson when installed (datetime, UUID and dataclasses natively, pydantic
+models through model_dump) and falls back to the stdlib encoder otherwise.
+"""
+
+import json
+from datetime import date, datetime
+from uuid import UUID
+
+from pydantic import BaseModel
+from starlette.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # optional dependency
+    orjson = None
+
+
+def _default(obj):
+    if isinstance(obj, BaseModel):
+        return obj.model_dump()
+    if orjson is None:
+        if isinstance(obj, (datetime, date)):
+            return obj.isoformat()
+        if isinstance(obj, UUID):
+            return str(obj)
+    if isinstance(obj, (set, frozenset, tuple)):
+        return list(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+if orjson is not None:
+    _ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS
+
+    def dumps(obj):
+        """Encode obj to compact UTF-8 JSON bytes"""
+        return orjson.dumps(obj, default=_default, option=_ORJSON_OPTIONS)
+
+    loads = orjson.loads
+else:
+    def dumps(obj):
+        """Encode obj to compact UTF-8 JSON bytes"""
+        return json.dumps(obj, default=_default, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+    loads = json.loads
+
+
+class FastJSONResponse(JSONResponse):
+    """App-wide JSON response class; return it directly to also skip jsonable_encoder"""
+
+    def render(self, content):
+        if isinstance(content, (bytes, bytearray)):
+            return bytes(content)
+        return dumps(content)
+
+
+def sse_event(payload, event=None):
+    """Frame pre-encoded JSON bytes as a server-sent event (optionally a named one)"""
+    if event is not None:
+        return b"event: " + event.encode() + b"\ndata: " + payload + b"\n\n"
+    return b"data: " + payload + b"\n\n"
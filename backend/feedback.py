@@ -0,0 +1,121 @@
+"""
+Real-time CPR coaching from a per-device sliding window.
+
+Every ingested sample updates the device's window in O(1) amortized time:
+running sums give the mean compression rate and depth over the last
+WINDOW_SECONDS, and a monotonic deque gives the minimum pressure, which
+stays high when the rescuer leans on the chest instead of letting it
+recoil. Cues ("faster", "deeper", "release", ...) are returned in the
+ingest acknowledgement and published on the event bus for dashboards, so
+both see them within one sample interval.
+
+Targets follow the guideline ranges also used by the simulator's
+calculate_quality_score: 100-120 compressions/min, 5-6 cm depth.
+
+Windows are kept per worker process; with several workers each sees a
+share of a device's samples, which still gives representative means.
+"""
+
+import time
+from collections import OrderedDict, deque
+
+WINDOW_SECONDS = 5.0
+MIN_SAMPLES = 3
+
+RATE_RANGE = (100.0, 120.0)     # compressions/min
+DEPTH_RANGE = (5.0, 6.0)        # cm
+RECOIL_PRESSURE = 0.3           # pressure that must be reached between compressions
+
+
+def _band_score(value, low, high, tolerance):
+    if low <= value <= high:
+        return 1.0
+    if low - tolerance <= value <= high + tolerance:
+        return 0.7
+    return 0.3 if value > 0 else 0.0
+
+
+class CPRWindow:
+    __slots__ = ("samples", "pressures", "rate_sum", "depth_sum", "compressions")
+
+    def __init__(self):
+        self.samples = deque()      # (time, rate, depth, pressure, compressing)
+        self.pressures = deque()    # (time, pressure), increasing pressures: front is the window minimum
+        self.rate_sum = 0.0
+        self.depth_sum = 0.0
+        self.compressions = 0
+
+    def add(self, now, rate, depth, pressure):
+        compressing = rate > 0
+        self.samples.append((now, rate, depth, pressure, compressing))
+        if compressing:
+            self.rate_sum += rate
+            self.depth_sum += depth
+            self.compressions += 1
+        if pressure is not None:
+            while self.pressures and self.pressures[-1][1] >= pressure:
+                self.pressures.pop()
+            self.pressures.append((now, pressure))
+
+        cutoff = now - WINDOW_SECONDS
+        while self.samples and self.samples[0][0] < cutoff:
+            _, old_rate, old_depth, _, old_compressing = self.samples.popleft()
+            if old_compressing:
+                self.rate_sum -= old_rate
+                self.depth_sum -= old_depth
+                self.compressions -= 1
+        while self.pressures and self.pressures[0][0] < cutoff:
+            self.pressures.popleft()
+
+    def summary(self):
+        """Window means, recoil flag, quality score and coaching cues (None while not compressing)"""
+        if self.compressions < MIN_SAMPLES:
+            return None
+        rate = self.rate_sum / self.compressions
+        depth = self.depth_sum / self.compressions
+        min_pressure = self.pressures[0][1] if self.pressures else None
+        full_recoil = None if min_pressure is None else min_pressure <= RECOIL_PRESSURE
+
+        cues = []
+        if rate < RATE_RANGE[0]:
+            cues.append("faster")
+        elif rate > RATE_RANGE[1]:
+            cues.append("slower")
+        if depth < DEPTH_RANGE[0]:
+            cues.append("deeper")
+        elif depth > DEPTH_RANGE[1]:
+            cues.append("softer")
+        if full_recoil is False:
+            cues.append("release")
+
+        scores = [_band_score(rate, *RATE_RANGE, 20.0), _band_score(depth, *DEPTH_RANGE, 1.0)]
+        if full_recoil is not None:
+            scores.append(1.0 if full_recoil else 0.5)
+        return {
+            "rate": round(rate, 1),
+            "depth": round(depth, 2),
+            "full_recoil": full_recoil,
+            "quality_score": round(sum(scores) / len(scores), 2),
+            "cues": cues,
+        }
+
+
+class CPRFeedback:
+    def __init__(self, max_devices=100000):
+        self.max_devices = max_devices
+        self._windows = OrderedDict()
+        self.samples = 0
+
+    def update(self, device_id, rate, depth, pressure=None, now=None):
+        """Add one sample to the device's window and return its current feedback"""
+        now = time.monotonic() if now is None else now
+        window = self._windows.get(device_id)
+        if window is None:
+            window = self._windows[device_id] = CPRWindow()
+            if len(self._windows) > self.max_devices:
+                self._windows.popitem(last=False)
+        else:
+            self._windows.move_to_end(device_id)
+        window.add(now, float(rate or 0), float(depth or 0), None if pressure is None else float(pressure))
+        self.samples += 1
+        return window.summary()
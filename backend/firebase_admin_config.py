@@ -1,33 +1,60 @@
-import firebase_admin
-from firebase_admin import credentials
-from firebase_admin import db as firebase_db
-from firebase_admin import auth as firebase_auth
 import os
+import threading
 from pathlib import Path
 from dotenv import load_dotenv
 
 # Load environment variables
 load_dotenv(Path(__file__).parent / '.env')
 
+# firebase_admin pulls in google-auth, httpx and grpc (~250 ms); it is imported
+# on first use so worker processes start without paying for it.
+_init_lock = threading.Lock()
+_initialized = False
+
 def initialize_firebase():
-    """Initialize Firebase Admin SDK"""
-    try:
-        # Get the service account key path
-        cred_path = os.getenv('FIREBASE_ADMIN_SDK_PATH', 
-                             '../myosa-9871-firebase-adminsdk-fbsvc-be6dc3c8b6.json')
-        
-        # Check if already initialized
-        if not firebase_admin._apps:
-            cred = credentials.Certificate(cred_path)
-            firebase_admin.initialize_app(cred, {
-                'databaseURL': os.getenv('FIREBASE_DATABASE_URL', 
-                                        'https://myosa-9871-default-rtdb.firebaseio.com')
-            })
-        
-        print("✅ Firebase initialized successfully")
-    except Exception as e:
-        print(f"❌ Firebase initialization error: {e}")
-        raise
+    """Initialize Firebase Admin SDK (idempotent, safe to call from any thread)"""
+    global _initialized
+    if _initialized:
+        return
+
+    with _init_lock:
+        if _initialized:
+            return
+        try:
+            import firebase_admin
+            from firebase_admin import credentials
+
+            # Get the service account key path (relative paths resolve from the repo root)
+            cred_path = Path(os.getenv('FIREBASE_ADMIN_SDK_PATH',
+                                       'myosa-9871-firebase-adminsdk-fbsvc-be6dc3c8b6.json'))
+            if not cred_path.is_absolute():
+                cred_path = Path(__file__).resolve().parent.parent / cred_path
+
+            # Check if already initialized
+            try:
+                firebase_admin.get_app()
+            except ValueError:
+                cred = credentials.Certificate(str(cred_path))
+                firebase_admin.initialize_app(cred, {
+                    'databaseURL': os.getenv('FIREBASE_DATABASE_URL',
+                                            'https://myosa-9871-default-rtdb.firebaseio.com')
+                })
+
+            _initialized = True
+            print("✅ Firebase initialized successfully")
+        except Exception as e:
+            print(f"❌ Firebase initialization error: {e}")
+            raise
+
+class _LazyDatabase:
+    """Stand-in for firebase_admin.db that initializes Firebase on first reference"""
+
+    def reference(self, path='/'):
+        initialize_firebase()
+        from firebase_admin import db
+        return db.reference(path)
+
+firebase_db = _LazyDatabase()
 
 def verify_firebase_token(authorization_header):
     """Verify Firebase ID token from Authorization header (Bearer <token>)"""
@@ -35,12 +62,14 @@ def verify_firebase_token(authorization_header):
         # Extract token from "Bearer <token>" format
         if not authorization_header:
             raise Exception("No authorization header provided")
-        
+
         if authorization_header.startswith("Bearer "):
             token = authorization_header[7:]  # Remove "Bearer " prefix
         else:
             token = authorization_header  # Assume it's just the token
-        
+
+        initialize_firebase()
+        from firebase_admin import auth as firebase_auth
         decoded_token = firebase_auth.verify_id_token(token)
         return decoded_token['uid']
     except Exception as e:
@@ -50,7 +79,7 @@ def get_user_by_uid(uid):
     """Get user data from database"""
     try:
         ref = firebase_db.reference(f'users/{uid}')
-        return ref.get().val()
+        return ref.get()
     except Exception as e:
         raise Exception(f"Error fetching user: {e}")
 
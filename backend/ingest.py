@@ -0,0 +1,88 @@
+"""
+Lean ingest pipeline for sensor readings.
+
+A reading is validated once (SensorDataCreate, see server.sensor_reading_body),
+stamped with a compact time-ordered key and written as-is. No second model,
+no uuid4, no response re-serialization.
+
+Each reading is also written under sensor_by_device/<device_id>/<key>, a
+per-device copy in time order, so latest-N and time-range reads for one
+device are bounded key queries instead of scans of sensor_data.
+"""
+
+import os
+import time
+from datetime import datetime, timezone
+
+# Firebase push-id alphabet: keys sort lexicographically in creation order
+PUSH_CHARS = "-0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ_abcdefghijklmnopqrstuvwxyz"
+
+# Per-device, time-ordered readings (placed in the device's shard by layout.py)
+DEVICE_INDEX = "sensor_by_device"
+
+# Device ids become a key in DEVICE_INDEX paths: one Firebase-safe path segment
+DEVICE_ID_PATTERN = r"^[A-Za-z0-9_-]{1,255}$"
+
+_last_push_ms = 0
+_last_rand = [0] * 12
+
+
+def push_id(now_ms=None):
+    """Generate a 20 char, time-ordered key compatible with Firebase push ids"""
+    global _last_push_ms
+    if now_ms is None:
+        now_ms = int(time.time() * 1000)
+
+    if now_ms == _last_push_ms:
+        # Same millisecond: increment the random suffix so keys stay ordered
+        for i in range(11, -1, -1):
+            if _last_rand[i] != 63:
+                _last_rand[i] += 1
+                break
+            _last_rand[i] = 0
+    else:
+        _last_push_ms = now_ms
+        for i, byte in enumerate(os.urandom(12)):
+            _last_rand[i] = byte & 63
+
+    return _encode_time(now_ms) + "".join(PUSH_CHARS[i] for i in _last_rand)
+
+
+def _encode_time(now_ms):
+    stamp = []
+    for _ in range(8):
+        stamp.append(PUSH_CHARS[now_ms % 64])
+        now_ms //= 64
+    return "".join(reversed(stamp))
+
+
+def push_id_bound(now_ms, upper=False):
+    """Smallest (or largest) push id that can be generated at now_ms, for key-range queries"""
+    return _encode_time(now_ms) + (PUSH_CHARS[-1] if upper else PUSH_CHARS[0]) * 12
+
+
+def push_id_time(key):
+    """Recover the millisecond timestamp encoded in a push id"""
+    now_ms = 0
+    for char in key[:8]:
+        now_ms = now_ms * 64 + PUSH_CHARS.index(char)
+    return now_ms
+
+
+def is_push_id(key):
+    return len(key) == 20 and all(char in PUSH_CHARS for char in key)
+
+
+def device_index_key(key, now_ms):
+    """Index key for a reading: its push id, or a time prefix + the old uuid4 key"""
+    return key if is_push_id(key) else _encode_time(now_ms) + key
+
+
+def sensor_record(data):
+    """Build the stored record for a validated reading; returns (key, record)"""
+    now = time.time()
+    key = push_id(int(now * 1000))
+    record = dict(data.__dict__)
+    record["id"] = key
+    record["timestamp"] = datetime.fromtimestamp(now, timezone.utc).isoformat()
+    return key, record
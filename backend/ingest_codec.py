@@ -0,0 +1,265 @@
+"""
+Compact ingest encodings for ESP32 sensor payloads.
+
+JSON stays the default. Devices that want to save bandwidth can post either
+MessagePack (map with the usual field names, or an array in field order) or
+a fixed-layout little-endian struct, selected by the Content-Type header.
+
+Fixed layout for POST /api/iot/sensor-data (application/vnd.resqpulse.reading):
+
+    <B version=1> <B flags> <B id_len> <id_len bytes device_id>
+    <8 x f32> compression_rate, compression_depth, pressure,
+              acceleration_x, acceleration_y, acceleration_z,
+              proximity, quality_score
+    [f32 temperature] [f32 humidity] [f32 altitude] [i16 gesture]
+
+    flags: 0x01 temperature, 0x02 humidity, 0x04 altitude, 0x08 gesture,
+           0x10 sos_triggered present, 0x20 sos_triggered value
+
+Fixed layout for POST /api/devices/{device_id}/sensor-data:
+
+    <B version=1> <B sections>
+    [cpr:         f32 compression_rate, f32 compression_depth, f32 quality_score]
+    [environment: f32 temperature, f32 humidity, f32 pressure, f32 altitude]
+    [gesture:     u8 gesture code (see GESTURE_TYPES), f32 proximity]
+    [status:      u8 battery_level, i8 wifi_signal (dBm), u8 sos_triggered]
+
+    sections: 0x01 cpr, 0x02 environment, 0x04 gesture, 0x08 status
+
+A legacy reading is 35 bytes plus the device id versus ~300 bytes of JSON.
+"""
+
+import json
+import struct
+
+try:
+    import msgpack
+except ImportError:  # optional dependency
+    msgpack = None
+
+JSON_CONTENT_TYPE = "application/json"
+STRUCT_CONTENT_TYPE = "application/vnd.resqpulse.reading"
+MSGPACK_CONTENT_TYPES = ("application/msgpack", "application/x-msgpack", "application/vnd.msgpack")
+
+FORMAT_VERSION = 1
+
+# Field order shared by the struct layout and positional MessagePack arrays
+READING_FIELDS = (
+    "device_id",
+    "compression_rate",
+    "compression_depth",
+    "pressure",
+    "acceleration_x",
+    "acceleration_y",
+    "acceleration_z",
+    "proximity",
+    "quality_score",
+    "temperature",
+    "humidity",
+    "altitude",
+    "gesture",
+    "sos_triggered",
+)
+
+GESTURE_TYPES = ("none", "up", "down", "left", "right", "near", "far")
+
+_HEADER = struct.Struct("<BBB")
+_CORE = struct.Struct("<8f")
+_F32 = struct.Struct("<f")
+_I16 = struct.Struct("<h")
+
+_FLAG_TEMPERATURE = 0x01
+_FLAG_HUMIDITY = 0x02
+_FLAG_ALTITUDE = 0x04
+_FLAG_GESTURE = 0x08
+_FLAG_SOS = 0x10
+_FLAG_SOS_VALUE = 0x20
+
+_DEVICE_HEADER = struct.Struct("<BB")
+_DEVICE_SECTIONS = (
+    (0x01, "cpr", struct.Struct("<3f"), ("compression_rate", "compression_depth", "quality_score")),
+    (0x02, "environment", struct.Struct("<4f"), ("temperature", "humidity", "pressure", "altitude")),
+    (0x04, "gesture", struct.Struct("<Bf"), ("gesture_type", "proximity")),
+    (0x08, "status", struct.Struct("<BbB"), ("battery_level", "wifi_signal", "sos_triggered")),
+)
+_DEVICE_DEFAULTS = {"battery_level": 100}
+
+
+class UnsupportedPayloadFormat(ValueError):
+    """Raised when a Content-Type has no matching decoder"""
+
+
+def payload_format(content_type):
+    """Map a Content-Type header to 'json', 'msgpack' or 'struct'"""
+    media_type = (content_type or JSON_CONTENT_TYPE).split(";", 1)[0].strip().lower()
+    if media_type in ("", JSON_CONTENT_TYPE) or media_type.endswith("+json"):
+        return "json"
+    if media_type == STRUCT_CONTENT_TYPE:
+        return "struct"
+    if media_type in MSGPACK_CONTENT_TYPES:
+        if msgpack is None:
+            raise UnsupportedPayloadFormat("MessagePack payloads require the 'msgpack' package")
+        return "msgpack"
+    raise UnsupportedPayloadFormat(f"Unsupported content type: {media_type}")
+
+
+def _round32(value):
+    """Trim float32 noise so 5.2 doesn't come back as 5.199999809265137"""
+    return float(f"{value:.7g}")
+
+
+def _check_version(version):
+    if version != FORMAT_VERSION:
+        raise ValueError(f"Unsupported payload version: {version}")
+
+
+# ============= LEGACY READING (/iot/sensor-data) =============
+
+def encode_reading(reading):
+    """Pack a reading dict into the fixed struct layout"""
+    device_id = reading["device_id"].encode("utf-8")
+    if len(device_id) > 255:
+        raise ValueError("device_id too long for struct encoding")
+
+    flags = 0
+    tail = b""
+    if reading.get("temperature") is not None:
+        flags |= _FLAG_TEMPERATURE
+        tail += _F32.pack(reading["temperature"])
+    if reading.get("humidity") is not None:
+        flags |= _FLAG_HUMIDITY
+        tail += _F32.pack(reading["humidity"])
+    if reading.get("altitude") is not None:
+        flags |= _FLAG_ALTITUDE
+        tail += _F32.pack(reading["altitude"])
+    if reading.get("gesture") is not None:
+        flags |= _FLAG_GESTURE
+        tail += _I16.pack(reading["gesture"])
+    if reading.get("sos_triggered") is not None:
+        flags |= _FLAG_SOS
+        if reading["sos_triggered"]:
+            flags |= _FLAG_SOS_VALUE
+
+    core = _CORE.pack(*(reading[name] for name in READING_FIELDS[1:9]))
+    return _HEADER.pack(FORMAT_VERSION, flags, len(device_id)) + device_id + core + tail
+
+
+def decode_reading(payload):
+    """Unpack the fixed struct layout into a reading dict"""
+    try:
+        version, flags, id_len = _HEADER.unpack_from(payload, 0)
+        _check_version(version)
+        offset = _HEADER.size
+        reading = {"device_id": bytes(payload[offset:offset + id_len]).decode("utf-8")}
+        offset += id_len
+
+        for name, value in zip(READING_FIELDS[1:9], _CORE.unpack_from(payload, offset)):
+            reading[name] = _round32(value)
+        offset += _CORE.size
+
+        for flag, name in ((_FLAG_TEMPERATURE, "temperature"), (_FLAG_HUMIDITY, "humidity"), (_FLAG_ALTITUDE, "altitude")):
+            if flags & flag:
+                reading[name] = _round32(_F32.unpack_from(payload, offset)[0])
+                offset += _F32.size
+        if flags & _FLAG_GESTURE:
+            reading["gesture"] = _I16.unpack_from(payload, offset)[0]
+            offset += _I16.size
+        if flags & _FLAG_SOS:
+            reading["sos_triggered"] = bool(flags & _FLAG_SOS_VALUE)
+    except (struct.error, UnicodeDecodeError) as e:
+        raise ValueError(f"Malformed reading payload: {e}")
+
+    if offset != len(payload):
+        raise ValueError("Malformed reading payload: trailing bytes")
+    return reading
+
+
+# ============= DEVICE PAYLOAD (/devices/{id}/sensor-data) =============
+
+def encode_device_payload(data):
+    """Pack a sectioned device payload dict into the fixed struct layout"""
+    sections = 0
+    body = b""
+    for bit, section, layout, fields in _DEVICE_SECTIONS:
+        if section not in data:
+            continue
+        sections |= bit
+        values = dict(data[section])
+        if section == "gesture":
+            gesture_type = values.get("gesture_type", "none")
+            values["gesture_type"] = GESTURE_TYPES.index(gesture_type) if gesture_type in GESTURE_TYPES else 0
+        if section == "status":
+            values["sos_triggered"] = int(bool(values.get("sos_triggered", False)))
+        body += layout.pack(*(values.get(name, _DEVICE_DEFAULTS.get(name, 0)) for name in fields))
+    return _DEVICE_HEADER.pack(FORMAT_VERSION, sections) + body
+
+
+def decode_device_payload(payload):
+    """Unpack the fixed struct layout into a sectioned device payload dict"""
+    try:
+        version, sections = _DEVICE_HEADER.unpack_from(payload, 0)
+        _check_version(version)
+        offset = _DEVICE_HEADER.size
+        data = {}
+        for bit, section, layout, fields in _DEVICE_SECTIONS:
+            if not sections & bit:
+                continue
+            values = dict(zip(fields, layout.unpack_from(payload, offset)))
+            offset += layout.size
+            if section == "gesture":
+                code = values["gesture_type"]
+                values["gesture_type"] = GESTURE_TYPES[code] if code < len(GESTURE_TYPES) else "none"
+                values["proximity"] = _round32(values["proximity"])
+            elif section == "status":
+                values["sos_triggered"] = bool(values["sos_triggered"])
+            else:
+                values = {name: _round32(value) for name, value in values.items()}
+            data[section] = values
+    except struct.error as e:
+        raise ValueError(f"Malformed device payload: {e}")
+
+    if offset != len(payload):
+        raise ValueError("Malformed device payload: trailing bytes")
+    return data
+
+
+# ============= CONTENT NEGOTIATION =============
+
+def _decode_msgpack(payload, positional_fields=None):
+    try:
+        data = msgpack.unpackb(payload, raw=False)
+    except Exception as e:
+        raise ValueError(f"Malformed MessagePack payload: {e}")
+    if positional_fields and isinstance(data, (list, tuple)):
+        if len(data) > len(positional_fields):
+            raise ValueError("Too many fields in MessagePack array")
+        data = dict(zip(positional_fields, data))
+    if not isinstance(data, dict):
+        raise ValueError("MessagePack payload must be a map")
+    return data
+
+
+def decode_reading_body(payload, content_type):
+    """Decode a legacy reading body; JSON is returned as raw bytes for pydantic to parse"""
+    fmt = payload_format(content_type)
+    if fmt == "json":
+        return payload
+    if fmt == "struct":
+        return decode_reading(payload)
+    return _decode_msgpack(payload, READING_FIELDS)
+
+
+def decode_device_body(payload, content_type):
+    """Decode a sectioned device payload body into a dict"""
+    fmt = payload_format(content_type)
+    if fmt == "json":
+        try:
+            data = json.loads(payload)
+        except ValueError as e:
+            raise ValueError(f"Malformed JSON payload: {e}")
+        if not isinstance(data, dict):
+            raise ValueError("JSON payload must be an object")
+        return data
+    if fmt == "struct":
+        return decode_device_payload(payload)
+    return _decode_msgpack(payload)
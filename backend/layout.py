@@ -0,0 +1,191 @@
+"""
+Sharded Firebase path layout for devices, readings and sessions.
+
+SHARD_LAYOUT selects where records live (SHARD_BUCKETS sets the hash
+bucket count, default 64):
+
+    flat      devices/<id>, sensor_by_device/<id>, sessions/<id>   (default)
+    hash      shards/h<NN>/devices/<id>, ...     NN = crc32(id) % buckets
+    org       shards/<org>/devices/<id>, ...
+    org+hash  shards/<org>/h<NN>/devices/<id>, ...
+
+A device's readings (sensor_by_device) live in its device's shard; a
+session is hashed by its own id and placed in its device's organization.
+Fleet-wide reads walk the collections shard by shard, so no request reads a
+node spanning the whole fleet and writes from different devices land in
+different subtrees. In a sharded layout the flat sensor_data log is no
+longer written.
+
+With organization sharding a shard cannot be derived from an id alone:
+shard_directory/<collection>/<id> records it, written in the same
+multi-path update as the record itself and cached in memory. Devices never
+registered through the API (firmware only) belong to "_unassigned". That
+fallback is only cached for SHARD_FALLBACK_SECONDS (default 30), so a
+directory entry written later (by migrate_layout.py, which also asks the
+workers to forget() their cached shards) is picked up without a restart.
+
+Existing flat data is moved into the configured layout with
+migrate_layout.py.
+"""
+
+import os
+import re
+import time
+import zlib
+from collections import OrderedDict
+from itertools import chain
+
+from firebase_admin_config import firebase_db
+from ingest import DEVICE_INDEX
+from streaming import PAGE_SIZE, iter_children
+
+FLAT = "flat"
+HASH = "hash"
+ORG = "org"
+ORG_HASH = "org+hash"
+SCHEMES = (FLAT, HASH, ORG, ORG_HASH)
+
+DEVICES = "devices"
+READINGS = DEVICE_INDEX
+SESSIONS = "sessions"
+
+SHARD_ROOT = "shards"
+DIRECTORY_ROOT = "shard_directory"
+UNASSIGNED = "_unassigned"
+
+
+def org_key(organization):
+    """Firebase-safe key for an organization name (None when unassigned)"""
+    if not organization:
+        return None
+    return re.sub(r"[.$#\[\]/]", "_", str(organization))
+
+
+def child_keys(path):
+    """Keys of path's children, without reading their values"""
+    return sorted(firebase_db.reference(path).get(shallow=True) or {})
+
+
+class PathLayout:
+    def __init__(self, scheme=FLAT, buckets=64, cache_size=100000, fallback_seconds=30.0):
+        if scheme not in SCHEMES:
+            raise ValueError(f"Unknown shard layout {scheme!r} (expected one of {', '.join(SCHEMES)})")
+        if buckets < 1:
+            raise ValueError("Shard bucket count must be positive")
+        self.scheme = scheme
+        self.buckets = buckets
+        self.cache_size = cache_size
+        self.fallback_seconds = fallback_seconds
+        self._width = len(f"{buckets - 1:x}")
+        self._directory = OrderedDict()     # (collection, id) -> (shard, expiry or None)
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            scheme=os.environ.get("SHARD_LAYOUT", FLAT).strip().lower(),
+            buckets=int(os.environ.get("SHARD_BUCKETS", 64)),
+            fallback_seconds=float(os.environ.get("SHARD_FALLBACK_SECONDS", 30)),
+        )
+
+    @property
+    def sharded(self):
+        return self.scheme != FLAT
+
+    @property
+    def by_org(self):
+        return self.scheme in (ORG, ORG_HASH)
+
+    @property
+    def by_hash(self):
+        return self.scheme in (HASH, ORG_HASH)
+
+    def bucket(self, key):
+        return self.bucket_name(zlib.crc32(str(key).encode()) % self.buckets)
+
+    def bucket_name(self, number):
+        return f"h{number:0{self._width}x}"
+
+    def shard(self, key, organization=None):
+        """Shard of the record key belongs to (None in the flat layout)"""
+        parts = []
+        if self.by_org:
+            parts.append(org_key(organization) or UNASSIGNED)
+        if self.by_hash:
+            parts.append(self.bucket(key))
+        return "/".join(parts) or None
+
+    def _remember(self, collection, key, shard, expiry=None):
+        self._directory[(collection, key)] = (shard, expiry)
+        self._directory.move_to_end((collection, key))
+        if len(self._directory) > self.cache_size:
+            self._directory.popitem(last=False)
+
+    def lookup(self, collection, key):
+        """Shard of an existing record (a directory read, cached, under organization sharding)"""
+        if not self.by_org:
+            return self.shard(key)
+        shard, expiry = self._directory.get((collection, key), (None, None))
+        if shard is not None and (expiry is None or expiry > time.monotonic()):
+            return shard
+        shard = firebase_db.reference(f"{DIRECTORY_ROOT}/{collection}/{key}").get()
+        if shard:
+            self._remember(collection, key, shard)
+            return shard
+        # No directory entry (yet): the unassigned fallback is cached briefly only
+        shard = self.shard(key)
+        self._remember(collection, key, shard, time.monotonic() + self.fallback_seconds)
+        return shard
+
+    def forget(self):
+        """Drop every cached shard (after migrate_layout.py rewrote the directory)"""
+        self._directory.clear()
+
+    def unassigned(self, shard):
+        """Whether shard holds records of no organization"""
+        return self.by_org and shard.split("/")[0] == UNASSIGNED
+
+    def assign(self, collection, key, organization=None):
+        """Place a new record; returns (shard, directory updates to write with it)"""
+        shard = self.shard(key, organization)
+        if not self.by_org:
+            return shard, {}
+        self._remember(collection, key, shard)
+        return shard, {f"{DIRECTORY_ROOT}/{collection}/{key}": shard}
+
+    def path(self, collection, shard, *parts):
+        prefix = f"{SHARD_ROOT}/{shard}/" if shard else ""
+        return "/".join((f"{prefix}{collection}", *parts))
+
+    def device_path(self, device_id, *parts):
+        return self.path(DEVICES, self.lookup(DEVICES, device_id), device_id, *parts)
+
+    def readings_path(self, device_id, *parts):
+        return self.path(READINGS, self.lookup(DEVICES, device_id), device_id, *parts)
+
+    def session_path(self, session_id, *parts):
+        return self.path(SESSIONS, self.lookup(SESSIONS, session_id), session_id, *parts)
+
+    def shards(self):
+        """Every shard that can hold records ([None] in the flat layout)"""
+        if not self.sharded:
+            return [None]
+        buckets = [self.bucket_name(n) for n in range(self.buckets)] if self.by_hash else [None]
+        orgs = child_keys(SHARD_ROOT) if self.by_org else [None]
+        return ["/".join(part for part in (org, bucket) if part) for org in orgs for bucket in buckets]
+
+    def collection_paths(self, collection):
+        """Paths of collection in every shard"""
+        return [self.path(collection, shard) for shard in self.shards()]
+
+    def unassigned_shards(self):
+        """Shards of records with no organization (none without organization sharding)"""
+        return [shard for shard in self.shards() if shard and self.unassigned(shard)] if self.by_org else []
+
+    def iter_collection(self, collection, page_size=PAGE_SIZE):
+        """Yield (key, value) for every record of collection, one shard and page at a time"""
+        return chain.from_iterable(
+            iter_children(path, page_size) for path in self.collection_paths(collection)
+        )
+
+
+layout = PathLayout.from_env()
@@ -0,0 +1,121 @@
+"""
+Device liveness from a hierarchical timing wheel.
+
+Every reading (from any worker, via the event bus) marks its device as seen
+in O(1): only the last-seen time is updated. A device sits in exactly one
+wheel slot; when the slot comes due its real deadline is checked and it is
+either declared offline or re-filed (lazy rescheduling). Two 64-slot wheels
+(1 s ticks, then 64 s ticks cascading into the first) cover silence windows
+of about an hour without periodic scans of all devices.
+
+Every worker tracks every device so a leader change needs no warm-up, but
+only the worker holding the leader lock writes connectivity changes and
+publishes them.
+"""
+
+import math
+import os
+import time
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:  # Windows: every process considers itself the leader
+    fcntl = None
+
+SLOTS = 64
+
+
+class LivenessTracker:
+    def __init__(self, timeout_seconds=30.0, tick_seconds=1.0, now=None):
+        # Keep deadlines inside the outer wheel so a slot never wraps onto itself
+        self.timeout = min(timeout_seconds, tick_seconds * SLOTS * (SLOTS - 1))
+        self.tick = tick_seconds
+        self._current = int((time.time() if now is None else now) / tick_seconds)
+        self._wheels = [[set() for _ in range(SLOTS)] for _ in range(2)]
+        self._last_seen = {}
+
+    @classmethod
+    def from_env(cls):
+        return cls(timeout_seconds=float(os.environ.get("DEVICE_OFFLINE_SECONDS", 30)))
+
+    def __len__(self):
+        return len(self._last_seen)
+
+    def is_online(self, device_id):
+        return device_id in self._last_seen
+
+    def _schedule(self, device_id, deadline, earliest=1):
+        ticks = max(earliest, math.ceil(deadline / self.tick) - self._current)
+        if ticks < SLOTS:
+            self._wheels[0][(self._current + ticks) % SLOTS].add(device_id)
+        else:
+            self._wheels[1][((self._current + ticks) // SLOTS) % SLOTS].add(device_id)
+
+    def seen(self, device_id, now=None):
+        """Record a reading; returns True when the device just came online"""
+        now = time.time() if now is None else now
+        came_online = device_id not in self._last_seen
+        self._last_seen[device_id] = now
+        if came_online:
+            self._schedule(device_id, now + self.timeout)
+        return came_online
+
+    def advance(self, now=None):
+        """Move the wheel up to now; returns [(device_id, last_seen)] that went offline"""
+        now = time.time() if now is None else now
+        target = int(now / self.tick)
+        offline = []
+        while self._current < target:
+            self._current += 1
+            if self._current % SLOTS == 0:
+                # Cascade the outer slot now due into the inner wheel; a deadline
+                # on this very tick lands in the inner slot processed below
+                due = self._wheels[1][(self._current // SLOTS) % SLOTS]
+                self._wheels[1][(self._current // SLOTS) % SLOTS] = set()
+                for device_id in due:
+                    self._schedule(device_id, self._last_seen[device_id] + self.timeout, earliest=0)
+
+            slot = self._wheels[0][self._current % SLOTS]
+            self._wheels[0][self._current % SLOTS] = set()
+            for device_id in slot:
+                last_seen = self._last_seen[device_id]
+                if last_seen + self.timeout <= self._current * self.tick:
+                    del self._last_seen[device_id]
+                    offline.append((device_id, last_seen))
+                else:
+                    self._schedule(device_id, last_seen + self.timeout)
+        return offline
+
+
+class LeaderLock:
+    """Non-blocking exclusive file lock; the holder is the leader until it exits"""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self._fd = None
+
+    @property
+    def held(self):
+        return fcntl is None or self._fd is not None
+
+    def try_acquire(self):
+        if self.held:
+            return True
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            fd = os.open(self.path, os.O_RDWR | os.O_CREAT)
+        except OSError:
+            return False
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            return False
+        self._fd = fd
+        return True
+
+    def release(self):
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
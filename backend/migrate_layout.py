@@ -0,0 +1,172 @@
+"""
+Move flat devices, readings and sessions into the configured shard layout.
+
+    SHARD_LAYOUT=org+hash python migrate_layout.py [--dry-run] [--keep-source]
+
+Every record under devices/, sensor_by_device/ and sessions/ is copied to
+its shard (see layout.py) along with its shard directory entry. Each batch
+is one multi-path update that writes the copies and deletes the originals
+(unless --keep-source), so a record is never lost between the two layouts
+and an interrupted run is resumed by running the command again.
+
+Run it after the servers switched to the new SHARD_LAYOUT: fields already
+written in a record's new location (fresher ingest sections, running
+session stats) are kept, only the missing ones are copied. Readings that
+exist only in the legacy sensor_data log are indexed into the layout with
+backfill_device_index.py; sensor_data itself is left untouched.
+
+Under organization sharding, servers that switched before the migration
+found no directory entry for existing devices and wrote their ingest
+sections, readings and new sessions to "_unassigned". Those records are
+moved to their organization's shard first, so they take precedence over
+the older flat copies. Once done, the workers on this host are told over
+the event bus to drop their cached shards; workers on other hosts pick
+the directory up within SHARD_FALLBACK_SECONDS. Run the command once more
+after that to move anything written to "_unassigned" in the meantime.
+"""
+
+import argparse
+import asyncio
+
+from event_bus import EventBus
+from firebase_admin_config import firebase_db
+from layout import DEVICES, DIRECTORY_ROOT, READINGS, SESSIONS, UNASSIGNED, child_keys, layout
+from streaming import iter_children
+
+PAGE_SIZE = 1000
+WRITE_BATCH = 500
+
+
+class _Batch:
+    def __init__(self, dry_run):
+        self.dry_run = dry_run
+        self.updates = {}
+        self.moved = 0
+
+    def add(self, updates):
+        self.updates.update(updates)
+        self.moved += 1
+        if len(self.updates) >= WRITE_BATCH:
+            self.flush()
+
+    def flush(self):
+        if self.updates and not self.dry_run:
+            firebase_db.reference("/").update(self.updates)
+        self.updates = {}
+
+
+def _move_records(collection, batch, keep_source):
+    """Move every flat record of a device/session collection; returns the count"""
+    before = batch.moved
+    for key, record in iter_children(collection, PAGE_SIZE):
+        if not isinstance(record, dict):
+            continue
+        shard, updates = layout.assign(collection, key, record.get("organization"))
+        target = layout.path(collection, shard, key)
+        existing = child_keys(target)
+        updates.update({f"{target}/{name}": value for name, value in record.items() if name not in existing})
+        if not keep_source:
+            updates[f"{collection}/{key}"] = None
+        batch.add(updates)
+    batch.flush()
+    return batch.moved - before
+
+
+def _organization(collection, key):
+    """Organization of a record, from its flat copy or its shard directory entry"""
+    organization = firebase_db.reference(f"{collection}/{key}/organization").get()
+    if organization:
+        return organization
+    shard = firebase_db.reference(f"{DIRECTORY_ROOT}/{collection}/{key}").get() or UNASSIGNED
+    return None if layout.unassigned(shard) else shard.split("/")[0]
+
+
+def _move_unassigned_records(collection, batch, keep_source):
+    """Move records written to "_unassigned" that belong to an organization; returns the count"""
+    before = batch.moved
+    for source in layout.unassigned_shards():
+        for key, record in iter_children(layout.path(collection, source), PAGE_SIZE):
+            if not isinstance(record, dict):
+                continue
+            organization = record.get("organization") or _organization(collection, key)
+            if not organization and collection == SESSIONS and record.get("device_id"):
+                # Sessions are placed in their device's organization
+                organization = _organization(DEVICES, record["device_id"])
+            if not organization:
+                continue
+            shard, updates = layout.assign(collection, key, organization)
+            target = layout.path(collection, shard, key)
+            existing = child_keys(target)
+            updates.update({f"{target}/{name}": value for name, value in record.items() if name not in existing})
+            if "organization" not in existing:
+                updates[f"{target}/organization"] = organization
+            if not keep_source:
+                updates[layout.path(collection, source, key)] = None
+            batch.add(updates)
+        batch.flush()
+    return batch.moved - before
+
+
+def _move_readings(batch, keep_source):
+    """Move every device's flat reading index; returns the reading count"""
+    before = batch.moved
+    for device_id in child_keys(READINGS):
+        for key, record in iter_children(f"{READINGS}/{device_id}", PAGE_SIZE):
+            updates = {layout.readings_path(device_id, key): record}
+            if not keep_source:
+                updates[f"{READINGS}/{device_id}/{key}"] = None
+            batch.add(updates)
+        batch.flush()
+    for source in layout.unassigned_shards():
+        for device_id in child_keys(layout.path(READINGS, source)):
+            shard = layout.lookup(DEVICES, device_id)
+            if layout.unassigned(shard):
+                continue
+            for key, record in iter_children(layout.path(READINGS, source, device_id), PAGE_SIZE):
+                updates = {layout.path(READINGS, shard, device_id, key): record}
+                if not keep_source:
+                    updates[layout.path(READINGS, source, device_id, key)] = None
+                batch.add(updates)
+            batch.flush()
+    return batch.moved - before
+
+
+def announce():
+    """Tell the workers on this host to drop their cached shards"""
+    async def publish():
+        bus = EventBus()
+        await bus.start()
+        bus.publish("layout", {"scheme": layout.scheme})
+        await bus.stop()
+
+    asyncio.run(publish())
+
+
+def migrate(dry_run=False, keep_source=False):
+    """Move flat records into the configured layout; returns (devices, sessions, readings)"""
+    if not layout.sharded:
+        raise RuntimeError("SHARD_LAYOUT is flat; set the target layout first")
+    batch = _Batch(dry_run)
+    # Devices first: their shards decide where their readings go
+    devices = _move_unassigned_records(DEVICES, batch, keep_source) + _move_records(DEVICES, batch, keep_source)
+    sessions = _move_unassigned_records(SESSIONS, batch, keep_source) + _move_records(SESSIONS, batch, keep_source)
+    readings = _move_readings(batch, keep_source)
+    if not dry_run:
+        announce()
+    return devices, sessions, readings
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Move flat devices, readings and sessions into SHARD_LAYOUT")
+    parser.add_argument("--dry-run", action="store_true", help="count what would be moved without writing")
+    parser.add_argument("--keep-source", action="store_true", help="copy without deleting the flat records")
+    args = parser.parse_args()
+
+    try:
+        devices, sessions, readings = migrate(args.dry_run, args.keep_source)
+        action = "Would move" if args.dry_run else "Moved"
+        print(f"✅ {action} {devices} devices, {sessions} sessions and {readings} readings to the "
+              f"{layout.scheme} layout")
+    except Exception as e:
+        print(f"❌ Migration failed: {e}")
+        raise SystemExit(1)
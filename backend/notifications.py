@@ -0,0 +1,116 @@
+"""
+Responder fan-out for emergency signals.
+
+Eligible responders are users whose role is one of the responder roles
+(an indexed equality query per role, run concurrently) and, when the
+emergency belongs to an organization, who are members of it. One
+notification per responder is written to notifications/<push id> in
+multi-path updates of batch_size entries, several batches in flight at a
+time. Dispatch latency (signal received -> last notification written) is
+measured per emergency and kept in the dispatcher's counters.
+"""
+
+import asyncio
+import logging
+import os
+import time
+
+from firebase_admin_config import firebase_db
+from ingest import push_id
+
+logger = logging.getLogger(__name__)
+
+
+class NotificationDispatcher:
+    def __init__(self, roles=("responder",), batch_size=500, concurrency=8, fallback=None):
+        self.roles = tuple(roles)
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        # Called with a batch that could not be written directly (e.g. the spool)
+        self.fallback = fallback
+        self.dispatched = 0
+        self.notifications = 0
+        self.last_latency_ms = None
+        self.max_latency_ms = 0.0
+
+    @classmethod
+    def from_env(cls, fallback=None):
+        roles = os.environ.get("EMERGENCY_RESPONDER_ROLES", "responder")
+        return cls(
+            roles=[role.strip() for role in roles.split(",") if role.strip()],
+            batch_size=int(os.environ.get("NOTIFICATION_BATCH_SIZE", 500)),
+            concurrency=int(os.environ.get("NOTIFICATION_CONCURRENCY", 8)),
+            fallback=fallback,
+        )
+
+    def _users_with_role(self, role):
+        return firebase_db.reference("users").order_by_child("role").equal_to(role).get() or {}
+
+    async def resolve_responders(self, organization=None):
+        """Uids of users with a responder role (in organization, if given)"""
+        results = await asyncio.gather(*(asyncio.to_thread(self._users_with_role, role) for role in self.roles))
+        responders = {}
+        for users in results:
+            for uid, user in users.items():
+                if not isinstance(user, dict):
+                    continue
+                if organization and user.get("organization") != organization:
+                    continue
+                responders[uid] = user
+        return list(responders)
+
+    def _write(self, updates):
+        try:
+            firebase_db.reference("/").update(updates)
+        except Exception as e:
+            if self.fallback is None:
+                raise
+            logger.warning(f"Notification batch queued for retry: {e}")
+            self.fallback(updates)
+
+    async def dispatch(self, emergency, organization=None, received_at=None):
+        """Notify every eligible responder; returns (responders alerted, latency ms)"""
+        received_at = time.perf_counter() if received_at is None else received_at
+        uids = await self.resolve_responders(organization)
+
+        now_ms = int(time.time() * 1000)
+        batches, batch = [], {}
+        for uid in uids:
+            batch[f"notifications/{push_id(now_ms)}"] = {
+                "userId": uid,
+                "type": "emergency",
+                "emergency_id": emergency["id"],
+                "device_id": emergency.get("device_id"),
+                "location": emergency.get("location"),
+                "organization": organization,
+                "timestamp": now_ms,
+                "read": False,
+            }
+            if len(batch) >= self.batch_size:
+                batches.append(batch)
+                batch = {}
+        if batch:
+            batches.append(batch)
+
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def write(updates):
+            async with semaphore:
+                await asyncio.to_thread(self._write, updates)
+
+        await asyncio.gather(*(write(updates) for updates in batches))
+
+        latency_ms = (time.perf_counter() - received_at) * 1000
+        self.dispatched += 1
+        self.notifications += len(uids)
+        self.last_latency_ms = latency_ms
+        self.max_latency_ms = max(self.max_latency_ms, latency_ms)
+        return len(uids), latency_ms
+
+    def stats(self):
+        return {
+            "emergencies": self.dispatched,
+            "notifications": self.notifications,
+            "last_latency_ms": self.last_latency_ms,
+            "max_latency_ms": self.max_latency_ms,
+        }
@@ -0,0 +1,141 @@
+"""
+Materialized per-organization analytics.
+
+org_analytics/<org> holds running totals that the API keeps current with
+server-side increments ({".sv": {"increment": n}}) inside the same kind of
+multi-path update as any other write, so concurrent workers never
+read-modify-write and a dashboard read is one small node:
+
+    sessions, active_sessions, completed_sessions, total_compressions,
+    quality_sum, rate_sum, depth_sum, devices
+
+Averages are derived on read. Device health (status, battery, signal,
+connectivity) changes with every ingest and liveness tick, so it is not
+materialized here; /devices/health/overview reads it live. Views for data written before this existed
+(or after a drift) are rebuilt from scratch with:
+
+    python org_analytics.py --rebuild
+"""
+
+import argparse
+from collections import defaultdict
+
+from firebase_admin_config import firebase_db
+from layout import DEVICES, SESSIONS, layout, org_key
+
+VIEW_ROOT = "org_analytics"
+PAGE_SIZE = 1000
+
+
+def increment(amount):
+    return {".sv": {"increment": amount}}
+
+
+def _updates(organization, deltas):
+    key = org_key(organization)
+    if key is None:
+        return {}
+    return {f"{VIEW_ROOT}/{key}/{name}": increment(amount) for name, amount in deltas.items() if amount}
+
+
+def session_started(organization):
+    return _updates(organization, {"sessions": 1, "active_sessions": 1})
+
+
+def session_completed(organization, stats):
+    return _updates(organization, {
+        "active_sessions": -1,
+        "completed_sessions": 1,
+        "total_compressions": int(stats.get("total_compressions") or 0),
+        "quality_sum": float(stats.get("quality_score") or 0),
+        "rate_sum": float(stats.get("average_rate") or 0),
+        "depth_sum": float(stats.get("average_depth") or 0),
+    })
+
+
+def _device_deltas(device, sign):
+    return {"devices": sign}
+
+
+def device_registered(device):
+    return _updates(device.get("organization"), _device_deltas(device, 1))
+
+
+def device_changed(old, new):
+    """Move a device's contribution from its old to its new organization"""
+    updates = _updates(old.get("organization"), _device_deltas(old, -1))
+    for path, value in _updates(new.get("organization"), _device_deltas(new, 1)).items():
+        if path in updates:
+            # Same organization: fold both deltas into one increment
+            amount = updates[path][".sv"]["increment"] + value[".sv"]["increment"]
+            if amount:
+                updates[path] = increment(amount)
+            else:
+                del updates[path]
+        else:
+            updates[path] = value
+    return updates
+
+
+def view(organization, totals):
+    """Public view of an organization's totals"""
+    totals = totals or {}
+    completed = totals.get("completed_sessions") or 0
+    return {
+        "organization": organization,
+        "total_sessions": totals.get("sessions", 0),
+        "active_sessions": totals.get("active_sessions", 0),
+        "completed_sessions": completed,
+        "total_compressions": totals.get("total_compressions", 0),
+        "average_quality": totals.get("quality_sum", 0) / completed if completed else 0,
+        "average_rate": totals.get("rate_sum", 0) / completed if completed else 0,
+        "average_depth": totals.get("depth_sum", 0) / completed if completed else 0,
+        "total_devices": totals.get("devices", 0),
+    }
+
+
+def rebuild():
+    """Recompute every organization's totals from sessions and devices; returns the org count"""
+    totals = defaultdict(lambda: defaultdict(int))
+    for _, device in layout.iter_collection(DEVICES, PAGE_SIZE):
+        key = org_key(device.get("organization")) if isinstance(device, dict) else None
+        if key is not None:
+            for name, amount in _device_deltas(device, 1).items():
+                totals[key][name] += amount
+
+    for _, session in layout.iter_collection(SESSIONS, PAGE_SIZE):
+        key = org_key(session.get("organization")) if isinstance(session, dict) else None
+        if key is None:
+            continue
+        totals[key]["sessions"] += 1
+        if session.get("status") == "active":
+            totals[key]["active_sessions"] += 1
+        elif session.get("status") == "completed":
+            totals[key]["completed_sessions"] += 1
+            totals[key]["total_compressions"] += int(session.get("total_compressions") or 0)
+            totals[key]["quality_sum"] += float(session.get("quality_score") or 0)
+            totals[key]["rate_sum"] += float(session.get("average_rate") or 0)
+            totals[key]["depth_sum"] += float(session.get("average_depth") or 0)
+
+    ref = firebase_db.reference(VIEW_ROOT)
+    if totals:
+        ref.set({key: dict(values) for key, values in totals.items()})
+    else:
+        ref.delete()
+    return len(totals)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Maintain the per-organization analytics views")
+    parser.add_argument("--rebuild", action="store_true", help="recompute all views from sessions and devices")
+    args = parser.parse_args()
+    if not args.rebuild:
+        parser.print_help()
+        raise SystemExit(0)
+
+    try:
+        count = rebuild()
+        print(f"✅ Rebuilt analytics for {count} organizations")
+    except Exception as e:
+        print(f"❌ Rebuild failed: {e}")
+        raise SystemExit(1)
@@ -0,0 +1,81 @@
+"""
+Seekable replay of recorded CPR sessions.
+
+When a session is closed its readings are copied, in compact form, to
+session_replay/<session_id>/<offset key>. The key is the reading's offset
+from the session start in zero-padded milliseconds followed by its reading
+id, so Firebase's key ordering is time ordering and seeking to an offset is
+a single order_by_key().start_at() query (a binary search on the server)
+instead of a scan. Replay then pages through the index, never holding more
+than one page of the session in memory.
+"""
+
+from datetime import datetime
+
+from export import iter_device_readings, record_time_ms
+from firebase_admin_config import firebase_db
+from streaming import iter_children
+
+# Fields kept for replay (the rest of a reading is not shown in debriefs)
+REPLAY_FIELDS = (
+    "compression_rate",
+    "compression_depth",
+    "pressure",
+    "acceleration_x",
+    "acceleration_y",
+    "acceleration_z",
+    "proximity",
+    "quality_score",
+    "gesture",
+    "sos_triggered",
+)
+
+OFFSET_DIGITS = 10      # ~115 days of milliseconds
+WRITE_BATCH = 500
+PAGE_SIZE = 200
+
+
+def offset_key(offset_ms):
+    """Index key prefix for an offset; every reading at or after it sorts after it"""
+    return f"{max(0, int(offset_ms)):0{OFFSET_DIGITS}d}"
+
+
+def replay_path(session_id):
+    return f"session_replay/{session_id}"
+
+
+def _epoch_ms(value):
+    if isinstance(value, datetime):
+        return int(value.timestamp() * 1000)
+    return record_time_ms({"timestamp": value})
+
+
+def build_replay_index(session_id, device_id, start_time, end_time):
+    """Copy the session's readings into its replay index; returns (count, duration_ms)"""
+    start_ms, end_ms = _epoch_ms(start_time), _epoch_ms(end_time)
+    root = firebase_db.reference("/")
+    root.update({replay_path(session_id): None})
+
+    updates, count, last_offset = {}, 0, 0
+    for reading in iter_device_readings(device_id, start_ms, end_ms, page_size=PAGE_SIZE):
+        stamp = record_time_ms(reading)
+        if stamp is None:
+            continue
+        last_offset = stamp - start_ms
+        sample = {name: reading[name] for name in REPLAY_FIELDS if reading.get(name) is not None}
+        sample["offset_ms"] = last_offset
+        updates[f"{replay_path(session_id)}/{offset_key(last_offset)}-{reading['id']}"] = sample
+        count += 1
+        if len(updates) >= WRITE_BATCH:
+            root.update(updates)
+            updates = {}
+    if updates:
+        root.update(updates)
+    return count, last_offset
+
+
+def iter_replay(session_id, start_ms=0, page_size=PAGE_SIZE):
+    """Yield the session's samples in time order from start_ms (offset from session start)"""
+    start_after = offset_key(start_ms) if start_ms else None
+    for _, sample in iter_children(replay_path(session_id), page_size, start_after=start_after):
+        yield sample
@@ -0,0 +1,55 @@
+"""
+Server-driven adaptive sampling.
+
+Every ingest acknowledgement carries next_interval_ms, the send interval the
+device should use next. Devices sample at full rate during CPR and SOS,
+back off progressively while idle, slow down further on low battery, and
+idle devices are slowed again when the server is under load. Active CPR
+and SOS are never slowed for load.
+"""
+
+import time
+from collections import OrderedDict
+
+INTERVAL_ACTIVE_MS = 100        # matches SEND_INTERVAL in esp32/config.h
+INTERVAL_RECENT_MS = 250        # just stopped compressing: CPR may resume
+INTERVAL_IDLE_MS = 1000
+INTERVAL_DORMANT_MS = 5000
+MAX_INTERVAL_MS = 10000
+
+RECENT_SECONDS = 10
+DORMANT_SECONDS = 60
+LOW_BATTERY_PERCENT = 20
+
+
+class SamplingAdvisor:
+    def __init__(self, max_devices=100000):
+        self.max_devices = max_devices
+        # device_id -> monotonic time of the last compressing/SOS reading
+        self._last_active = OrderedDict()
+
+    def recommend(self, device_id, active, sos=False, battery_level=None, load=0.0, now=None):
+        """Next send interval in ms for a device given its latest reading and server load (0..1)"""
+        now = time.monotonic() if now is None else now
+        if active or sos:
+            self._last_active[device_id] = now
+            self._last_active.move_to_end(device_id)
+            if len(self._last_active) > self.max_devices:
+                self._last_active.popitem(last=False)
+            return INTERVAL_ACTIVE_MS
+
+        idle_for = now - self._last_active.get(device_id, now - DORMANT_SECONDS)
+        if idle_for < RECENT_SECONDS:
+            interval = INTERVAL_RECENT_MS
+        elif idle_for < DORMANT_SECONDS:
+            interval = INTERVAL_IDLE_MS
+        else:
+            interval = INTERVAL_DORMANT_MS
+
+        if battery_level is not None and battery_level < LOW_BATTERY_PERCENT:
+            interval *= 2
+        if load > 0.8:
+            interval *= 4
+        elif load > 0.5:
+            interval *= 2
+        return min(interval, MAX_INTERVAL_MS)
@@ -1,49 +1,306 @@
-from fastapi import FastAPI, APIRouter, Depends, HTTPException, Header
+from fastapi import FastAPI, APIRouter, Depends, HTTPException, Header, Query, Request
+from fastapi.exceptions import RequestValidationError
 from fastapi.responses import StreamingResponse
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
-from motor.motor_asyncio import AsyncIOMotorClient
 import os
 import logging
+import math
+from contextlib import asynccontextmanager
 from pathlib import Path
-from pydantic import BaseModel, Field, ConfigDict
+from pydantic import BaseModel, Field, ConfigDict, ValidationError
 from typing import List, Optional
 import uuid
 from datetime import datetime, timezone, timedelta
 import asyncio
-import json
-from firebase_admin import db as firebase_db
-from firebase_admin_config import initialize_firebase, verify_firebase_token
+import time
+from itertools import islice
+from firebase_admin_config import firebase_db, initialize_firebase, verify_firebase_token
+from admission import (
+    PRIORITY_EMERGENCY, PRIORITY_NORMAL, AdmissionController, device_payload_priority, reading_priority,
+)
+from batch_read import PATH_PATTERN, ReadCache, batch_get, read_shards
+from conditional import ConditionalCache
+from deadband import DeadbandFilter
+from env_stats import LEGACY_ENV_FIELDS, EnvironmentStats
+from event_bus import CONFLATE, DROP_OLDEST, EventBus
+from export import csv_chunks, iter_device_readings, parse_time_bound
+from fast_json import FastJSONResponse, dumps, sse_event
+from feedback import CPRFeedback
+from ingest import DEVICE_ID_PATTERN, sensor_record
+from layout import DEVICES, SESSIONS, layout
+from liveness import LeaderLock, LivenessTracker
+from notifications import NotificationDispatcher
+from org_analytics import (
+    device_changed, device_registered, org_key, session_completed, session_started, view as org_view,
+)
+from replay import PAGE_SIZE as REPLAY_PAGE_SIZE, build_replay_index, iter_replay
+from sampling import SamplingAdvisor
+from singleflight import SingleFlight
+from session_buffer import SessionTracker
+from spool import Spool, SpoolFull, SpoolReplayer, check_paths, drain_orphan
+from streaming import (
+    NDJSON_MEDIA_TYPE, json_array_chunks, json_object_chunks, live_events,
+    ndjson_chunks, streamed_response, wants_ndjson,
+)
+from ingest_codec import UnsupportedPayloadFormat, decode_device_body, decode_reading_body
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
-# Initialize Firebase
-initialize_firebase()
-
-# MongoDB connection (optional)
-try:
-    mongo_url = os.environ.get('MONGO_URL')
-    if mongo_url:
-        client = AsyncIOMotorClient(mongo_url)
-        db = client[os.environ.get('DB_NAME', 'resqpulse')]
-except Exception as e:
-    print(f"MongoDB connection warning: {e}")
-    db = None
-
-app = FastAPI(title="ResqPulse API", version="1.0.0")
 api_router = APIRouter(prefix="/api")
 
 logger = logging.getLogger(__name__)
 
-# CORS middleware
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
+# Ingest, emergency and cache events shared with the other workers on this host
+event_bus = EventBus()
+
+# ETag validators for device, session and settings reads; writes invalidate them
+# on every worker ("resource" events, and per-device ingest events)
+conditional_cache = ConditionalCache(ttl_seconds=int(os.environ.get('ETAG_TTL_SECONDS', 30)))
+event_bus.on("resource", conditional_cache.invalidate)
+event_bus.on("device/*", lambda event: conditional_cache.invalidate(f"devices/{event['device_id']}"))
+
+# Overview endpoints read whole nodes: concurrent identical requests share one
+# read, and its result is reused for a short window unless a write lands
+overviews = SingleFlight(ttl_seconds=float(os.environ.get('OVERVIEW_CACHE_SECONDS', 1)))
+event_bus.on("emergency", lambda event: overviews.invalidate("emergency/active"))
+event_bus.on("resource", lambda resource: overviews.invalidate(f"{resource.split('/')[0]}/overview"))
+
+# Short-lived cache for batched device reads, cleared by ingest on every worker
+read_cache = ReadCache(ttl_seconds=float(os.environ.get('BATCH_CACHE_TTL_SECONDS', 2)))
+event_bus.on("device/*", lambda event: read_cache.invalidate(event["device_id"]))
+event_bus.on("resource", lambda resource: read_cache.invalidate(resource.partition("devices/")[2]))
+BATCH_GET_CONCURRENCY = int(os.environ.get('BATCH_GET_CONCURRENCY', 16))
+
+# migrate_layout.py announces rewritten shard directory entries
+event_bus.on("layout", lambda event: layout.forget())
+
+def resource_changed(resource):
+    """Invalidate cached validators for a resource on every worker"""
+    event_bus.publish("resource", resource)
+
+# Ingest writes go to a durable local spool first and are replayed to Firebase
+# in batches by a background task, so readings survive upstream outages
+spool = Spool(os.environ.get('SPOOL_DIR') or ROOT_DIR / 'spool')
+
+def _write_upstream(updates):
+    firebase_db.reference("/").update(updates)
+
+spool_replayer = SpoolReplayer(spool, _write_upstream)
+
+def persist(updates):
+    """Queue a multi-path ingest write in the spool (written directly if the spool isn't running)"""
+    # Reject malformed paths now: once queued they could only fail upstream
+    check_paths(updates)
+    if spool.is_open:
+        try:
+            spool.append(updates)
+            return
+        except (SpoolFull, ValueError, OSError) as e:
+            logger.warning(f"Spool unavailable, writing directly: {e}")
+    _write_upstream(updates)
+
+# Environment/status sections are only rewritten when they moved past their deadband
+deadband = DeadbandFilter.from_env()
+
+# Per-device and global ingest rate limits (SOS traffic is never limited)
+admission = AdmissionController.from_env()
+
+def admit_ingest(device_id, priority):
+    """Reject a reading with 429 + Retry-After when its device or the server is over budget"""
+    retry_after = admission.admit(device_id, priority)
+    if retry_after is not None:
+        raise HTTPException(
+            status_code=429,
+            detail="Ingest rate limit exceeded",
+            headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+        )
+
+# Recommended next send interval returned in every ingest acknowledgement
+sampling = SamplingAdvisor()
+
+def next_interval_ms(device_id, priority, battery_level=None):
+    return sampling.recommend(
+        device_id,
+        active=priority == PRIORITY_NORMAL,
+        sos=priority == PRIORITY_EMERGENCY,
+        battery_level=battery_level,
+        load=admission.load(),
+    )
+
+# Sliding-window CPR coaching computed on every ingested sample
+cpr_feedback = CPRFeedback()
+
+def coach(device_id, rate, depth, pressure=None):
+    """Update the device's CPR window and publish its cues for dashboards"""
+    feedback = cpr_feedback.update(device_id, rate, depth, pressure)
+    if feedback is not None:
+        event_bus.publish(f"feedback/{device_id}", {"device_id": device_id, **feedback})
+    return feedback
+
+# Emergency signals notify every eligible responder; batches that cannot be
+# written directly go through the spool
+notifier = NotificationDispatcher.from_env(fallback=persist)
+
+# Host-wide background writes (connectivity, session stats) are done by the one
+# worker holding this lock; every worker keeps the state so failover is instant
+leader = LeaderLock(event_bus.bus_dir / "leader.lock")
+
+# Online/offline detection fed by readings from every worker; the leader
+# writes devices/<id>/connectivity and publishes "liveness" events
+liveness = LivenessTracker.from_env()
+
+def connectivity_changed(device_id, state, last_seen):
+    connectivity = {"state": state, "last_seen": int(last_seen * 1000), "since": int(time.time() * 1000)}
+    try:
+        persist({layout.device_path(device_id, "connectivity"): connectivity})
+    except Exception as e:
+        logger.warning(f"Could not store connectivity of {device_id}: {e}")
+    event_bus.publish("liveness", {"device_id": device_id, **connectivity})
+
+def device_seen(device_id):
+    now = time.time()
+    if liveness.seen(device_id, now) and leader.held:
+        connectivity_changed(device_id, "online", now)
+
+# Active sessions buffer their device's CPR samples on every worker; the leader
+# writes incremental stats at a low rate and the close request the summary
+session_tracker = SessionTracker(max_samples=int(os.environ.get('SESSION_BUFFER_SAMPLES', 36000)))
+SESSION_STATS_SECONDS = float(os.environ.get('SESSION_STATS_SECONDS', 5))
+
+def _session_event(event):
+    if event["status"] == "active":
+        session_tracker.start(event["id"], event["device_id"], event["start_ms"])
+    else:
+        session_tracker.end(event["id"])
+
+# Rolling environment statistics (Welford, EWMA, windowed min/max) per device,
+# kept on every worker from the readings on the bus
+env_stats = EnvironmentStats.from_env()
+
+def on_reading(device_id, cpr, environment):
+    device_seen(device_id)
+    if environment:
+        env_stats.add(device_id, environment)
+    if cpr:
+        session_tracker.add_reading(
+            device_id, cpr.get("compression_rate"), cpr.get("compression_depth"), cpr.get("quality_score")
+        )
+
+event_bus.on("session", _session_event)
+event_bus.on("ingest/*", lambda record: on_reading(
+    record["device_id"], record, {name: record.get(name) for name in LEGACY_ENV_FIELDS}
+))
+event_bus.on("device/*", lambda event: on_reading(event["device_id"], event.get("cpr"), event.get("environment")))
+
+async def watch_liveness():
+    """Advance the liveness wheel once per tick and report devices gone silent"""
+    while True:
+        await asyncio.sleep(liveness.tick)
+        leader.try_acquire()
+        for device_id, last_seen in liveness.advance():
+            if leader.held:
+                connectivity_changed(device_id, "offline", last_seen)
+
+def _store_session_stats(buffer):
+    """Write a session's running stats and progress unless it was closed meanwhile"""
+    fields = {**buffer.stats(), "progress": buffer.progress()}
+
+    # A transaction, not a spooled write: the close may land on another worker,
+    # and stats replayed after it would put stale totals on the completed session
+    def update(current):
+        if not isinstance(current, dict) or current.get("status") != "active":
+            return current
+        return {**current, **fields}
+
+    firebase_db.reference(layout.session_path(buffer.session_id)).transaction(update)
+
+async def flush_session_stats():
+    """Write running stats of sessions that received samples, every SESSION_STATS_SECONDS"""
+    while True:
+        await asyncio.sleep(SESSION_STATS_SECONDS)
+        for buffer in session_tracker.take_dirty():
+            if not leader.held:
+                continue
+            try:
+                await asyncio.to_thread(_store_session_stats, buffer)
+                resource_changed(f"sessions/{buffer.session_id}")
+                resource_changed("sessions")
+            except Exception as e:
+                logger.warning(f"Could not store stats of session {buffer.session_id}: {e}")
+
+# Overflow policy of a live stream's per-viewer buffer (?policy=)
+STREAM_POLICY_PATTERN = f"^({DROP_OLDEST}|{CONFLATE})$"
+
+# Live streams fall back to polling Firebase after this long without a bus event,
+# which picks up readings written to Firebase directly by the firmware. Viewers
+# of the same device share one poll per interval
+STREAM_POLL_SECONDS = 2
+stream_polls = SingleFlight(ttl_seconds=STREAM_POLL_SECONDS)
+
+def _poll_readings(device_id):
+    data = firebase_db.reference(layout.readings_path(device_id)).order_by_key().limit_to_last(5).get()
+    return sse_event(dumps(data)) if data else None
+
+# ============= LAZY CLIENTS =============
+# Nothing is connected at import time: Firebase initializes on the first
+# reference (or in the background once the server is up).
+
+def _load_active_sessions():
+    active = {}
+    for path in layout.collection_paths(SESSIONS):
+        active.update(firebase_db.reference(path).order_by_child("status").equal_to("active").get() or {})
+    for session_id, data in active.items():
+        try:
+            session = Session.model_validate(data)
+        except ValidationError:
+            continue
+        # Continue from the stored totals rather than restarting them from zero
+        session_tracker.start(
+            session_id, session.device_id, int(session.start_time.timestamp() * 1000), data.get("progress")
+        )
+
+async def _warm_up_firebase():
+    try:
+        await asyncio.to_thread(initialize_firebase)
+        # Sessions started before this worker did keep accumulating samples
+        await asyncio.to_thread(_load_active_sessions)
+    except Exception as e:
+        # Not fatal: the first request retries through firebase_db.reference
+        logger.warning(f"Firebase warm-up failed: {e}")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    warm_up = asyncio.create_task(_warm_up_firebase())
+    await event_bus.start()
+    replayer = None
+    orphans = []
+    try:
+        spool.open()
+        replayer = asyncio.create_task(spool_replayer.run())
+        # Slots of workers the pool no longer runs (e.g. WEB_CONCURRENCY lowered)
+        orphans = [asyncio.create_task(drain_orphan(orphan, _write_upstream)) for orphan in spool.adopt_orphans()]
+    except Exception as e:
+        logger.warning(f"Ingest spool disabled, writing directly to Firebase: {e}")
+    leader.try_acquire()
+    liveness_task = asyncio.create_task(watch_liveness())
+    stats_task = asyncio.create_task(flush_session_stats())
+    try:
+        yield
+    finally:
+        warm_up.cancel()
+        liveness_task.cancel()
+        stats_task.cancel()
+        leader.release()
+        for orphan in orphans:
+            orphan.cancel()
+        await asyncio.gather(*orphans, return_exceptions=True)
+        if replayer is not None:
+            replayer.cancel()
+            await spool_replayer.drain(timeout=5)
+        spool.close()
+        await event_bus.stop()
 
 # ============= MODELS =============
 
@@ -56,6 +313,39 @@ class User(BaseModel):
     organization: Optional[str] = None
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
 
+class CPRData(BaseModel):
+    model_config = ConfigDict(extra="ignore")
+    timestamp: int
+    compression_rate: float
+    compression_depth: float
+    acceleration_x: float
+    acceleration_y: float
+    acceleration_z: float
+    quality_score: float
+
+class EnvironmentData(BaseModel):
+    model_config = ConfigDict(extra="ignore")
+    timestamp: int
+    temperature: float
+    humidity: float
+    pressure: float
+    altitude: float
+
+class GestureData(BaseModel):
+    model_config = ConfigDict(extra="ignore")
+    timestamp: int
+    proximity: int
+    gesture: int
+    sos_triggered: bool
+
+class DeviceStatus(BaseModel):
+    model_config = ConfigDict(extra="ignore")
+    timestamp: int
+    device_id: str
+    wifi_connected: bool
+    battery_level: int
+    last_update: int
+
 class SensorData(BaseModel):
     model_config = ConfigDict(extra="ignore")
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
@@ -69,9 +359,15 @@ class SensorData(BaseModel):
     acceleration_z: float
     proximity: float
     quality_score: float
+    # New sensor fields
+    temperature: Optional[float] = None
+    humidity: Optional[float] = None
+    altitude: Optional[float] = None
+    gesture: Optional[int] = None
+    sos_triggered: Optional[bool] = None
 
 class SensorDataCreate(BaseModel):
-    device_id: str
+    device_id: str = Field(..., pattern=DEVICE_ID_PATTERN)
     compression_rate: float
     compression_depth: float
     pressure: float
@@ -80,6 +376,12 @@ class SensorDataCreate(BaseModel):
     acceleration_z: float
     proximity: float
     quality_score: float
+    # New sensor fields
+    temperature: Optional[float] = None
+    humidity: Optional[float] = None
+    altitude: Optional[float] = None
+    gesture: Optional[int] = None
+    sos_triggered: Optional[bool] = None
 
 class Device(BaseModel):
     model_config = ConfigDict(extra="ignore")
@@ -90,10 +392,16 @@ class Device(BaseModel):
     signal_strength: int = 100
     last_sync: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
     location: Optional[str] = None
+    organization: Optional[str] = None
 
 class DeviceCreate(BaseModel):
     device_name: str
     location: Optional[str] = None
+    organization: Optional[str] = None
+
+class DeviceBatchGet(BaseModel):
+    device_ids: List[str] = Field(..., min_length=1, max_length=500)
+    paths: List[str] = Field(default=["cpr", "environment", "status"], min_length=1, max_length=20)
 
 class Session(BaseModel):
     model_config = ConfigDict(extra="ignore")
@@ -107,6 +415,7 @@ class Session(BaseModel):
     average_depth: float = 0.0
     quality_score: float = 0.0
     location: Optional[str] = None
+    organization: Optional[str] = None
     status: str = "active"
 
 class SessionCreate(BaseModel):
@@ -119,18 +428,47 @@ class EmergencySignal(BaseModel):
     device_id: str
     timestamp: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
     location: str
+    organization: Optional[str] = None
     status: str = "active"
     responders_alerted: int = 0
 
+# ============= INGEST BODIES =============
+# Ingest endpoints accept JSON, MessagePack or the compact struct layout
+# (see ingest_codec.py), negotiated by Content-Type.
+
+async def _decode_body(request: Request, decoder):
+    try:
+        return decoder(await request.body(), request.headers.get("content-type"))
+    except UnsupportedPayloadFormat as e:
+        raise HTTPException(status_code=415, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+async def sensor_reading_body(request: Request) -> SensorDataCreate:
+    """Decode and validate a legacy sensor reading in a single pass"""
+    body = await _decode_body(request, decode_reading_body)
+    try:
+        if isinstance(body, dict):
+            return SensorDataCreate.model_validate(body)
+        return SensorDataCreate.model_validate_json(body)
+    except ValidationError as e:
+        raise RequestValidationError(e.errors())
+
+async def device_payload_body(request: Request) -> dict:
+    """Decode a sectioned device payload (cpr/environment/gesture/status)"""
+    return await _decode_body(request, decode_device_body)
+
 # ============= ENDPOINTS =============
 
+ROOT_PAYLOAD = dumps({
+    "message": "ResqPulse API v1.0.0",
+    "status": "online",
+    "database": "Firebase Realtime Database"
+})
+
 @api_router.get("/")
 async def root():
-    return {
-        "message": "ResqPulse API v1.0.0",
-        "status": "online",
-        "database": "Firebase Realtime Database"
-    }
+    return FastJSONResponse(ROOT_PAYLOAD)
 
 @api_router.post("/auth/login")
 async def login(email: str, password: str):
@@ -153,61 +491,249 @@ async def get_user(authorization: str = Header(None)):
 
 # ============= IOT/SENSOR ENDPOINTS =============
 
-@api_router.post("/iot/sensor-data", response_model=SensorData)
-async def create_sensor_data(data: SensorDataCreate):
-    try:
-        sensor_data = SensorData(
-            device_id=data.device_id,
-            compression_rate=data.compression_rate,
-            compression_depth=data.compression_depth,
-            pressure=data.pressure,
-            acceleration_x=data.acceleration_x,
-            acceleration_y=data.acceleration_y,
-            acceleration_z=data.acceleration_z,
-            proximity=data.proximity,
-            quality_score=data.quality_score
-        )
+@api_router.post("/devices/{device_id}/sensor-data")
+async def create_device_sensor_data(device_id: str, data: dict = Depends(device_payload_body)):
+    """Create sensor data for a specific device with structured paths"""
+    priority = device_payload_priority(data)
+    admit_ingest(device_id, priority)
+    try:
+        timestamp = int(datetime.now(timezone.utc).timestamp() * 1000)
+        device_path = layout.device_path(device_id)
+        updates = {}
+        
+        # CPR Data
+        if "cpr" in data:
+            cpr_data = {
+                "compression_rate": data["cpr"].get("compression_rate", 0),
+                "compression_depth": data["cpr"].get("compression_depth", 0),
+                "quality_score": data["cpr"].get("quality_score", 0),
+                "timestamp": timestamp
+            }
+            updates[f"{device_path}/cpr"] = cpr_data
+            feedback = coach(device_id, cpr_data["compression_rate"], cpr_data["compression_depth"])
+        else:
+            feedback = None
         
-        # Save to Firebase
-        ref = firebase_db.reference(f"sensor_data/{sensor_data.id}")
-        ref.set(sensor_data.model_dump())
+        # Environment Data
+        if "environment" in data:
+            env_data = {
+                "temperature": data["environment"].get("temperature", 0),
+                "humidity": data["environment"].get("humidity", 0),
+                "pressure": data["environment"].get("pressure", 0),
+                "altitude": data["environment"].get("altitude", 0),
+                "timestamp": timestamp
+            }
+            if deadband.should_write(device_id, "environment", env_data):
+                updates[f"{device_path}/environment"] = env_data
         
-        return sensor_data
+        # Gesture Data
+        if "gesture" in data:
+            gesture_data = {
+                "gesture_type": data["gesture"].get("gesture_type", "none"),
+                "proximity": data["gesture"].get("proximity", 0),
+                "timestamp": timestamp
+            }
+            updates[f"{device_path}/gesture"] = gesture_data
+        
+        # Status Data
+        if "status" in data:
+            status_data = {
+                "battery_level": data["status"].get("battery_level", 100),
+                "wifi_signal": data["status"].get("wifi_signal", 0),
+                "sos_triggered": data["status"].get("sos_triggered", False),
+                "last_update": timestamp
+            }
+            if deadband.should_write(device_id, "status", status_data):
+                updates[f"{device_path}/status"] = status_data
+        
+        # One multi-path write, queued in the local spool
+        if updates:
+            persist(updates)
+        event_bus.publish(f"device/{device_id}", {"device_id": device_id, "timestamp": timestamp, **data})
+        battery_level = (data.get("status") or {}).get("battery_level")
+        return FastJSONResponse({
+            "status": "success",
+            "device_id": device_id,
+            "timestamp": timestamp,
+            "next_interval_ms": next_interval_ms(device_id, priority, battery_level),
+            "feedback": feedback,
+        })
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+# Registered before /devices/{device_id}/sensor-data so "all" isn't taken as a device id
+@api_router.get("/devices/all/sensor-data")
+async def get_all_devices_sensor_data(request: Request):
+    """Get sensor data for all devices (streamed page by page; NDJSON on request)"""
+    try:
+        devices = layout.iter_collection(DEVICES)
+        if wants_ndjson(request):
+            lines = ({"device_id": key, **value} for key, value in devices)
+            return await streamed_response(request, ndjson_chunks(lines), NDJSON_MEDIA_TYPE)
+        return await streamed_response(request, json_object_chunks(devices))
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@api_router.get("/devices/{device_id}/sensor-data")
+async def get_device_sensor_data(device_id: str):
+    """Get all sensor data for a specific device"""
+    try:
+        ref = firebase_db.reference(layout.device_path(device_id))
+        return ref.get() or {}
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@api_router.get("/devices/{device_id}/export")
+async def export_device_data(
+    device_id: str,
+    request: Request,
+    start: Optional[str] = Query(None, alias="from"),
+    end: Optional[str] = Query(None, alias="to"),
+    format: str = "ndjson",
+    cursor: Optional[str] = None,
+):
+    """
+    Stream a device's recorded readings as NDJSON or CSV.
+
+    from/to take epoch milliseconds or ISO-8601. Every row carries its id; pass
+    the last id received as cursor to resume an interrupted export.
+    """
+    if format not in ("ndjson", "csv"):
+        raise HTTPException(status_code=400, detail="format must be 'ndjson' or 'csv'")
+    try:
+        start_ms, end_ms = parse_time_bound(start), parse_time_bound(end)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid time bound: {e}")
+
+    try:
+        rows = iter_device_readings(device_id, start_ms, end_ms, cursor)
+        if format == "csv":
+            response = await streamed_response(request, csv_chunks(rows), "text/csv")
+        else:
+            response = await streamed_response(request, ndjson_chunks(rows), NDJSON_MEDIA_TYPE)
+        response.headers["Content-Disposition"] = f'attachment; filename="{device_id}-sensor-data.{format}"'
+        return response
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@api_router.get("/devices/{device_id}/cpr")
+async def get_device_cpr_data(device_id: str):
+    """Get CPR data for a specific device"""
+    try:
+        ref = firebase_db.reference(layout.device_path(device_id, "cpr"))
+        return ref.get() or {}
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@api_router.get("/devices/{device_id}/environment")
+async def get_device_environment_data(device_id: str):
+    """Get environment data for a specific device"""
+    try:
+        ref = firebase_db.reference(layout.device_path(device_id, "environment"))
+        return ref.get() or {}
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@api_router.get("/devices/{device_id}/environment/stats")
+async def get_device_environment_stats(device_id: str):
+    """Rolling environment statistics and anomaly flags, computed on ingest"""
+    fields = env_stats.snapshot(device_id)
+    if fields is None:
+        raise HTTPException(status_code=404, detail="No environment readings for this device yet")
+    return {
+        "device_id": device_id,
+        "window_seconds": env_stats.window_seconds,
+        "fields": fields,
+        "anomalies": [name for name, stat in fields.items() if stat["anomaly"]],
+    }
+
+@api_router.get("/devices/{device_id}/gesture")
+async def get_device_gesture_data(device_id: str):
+    """Get gesture data for a specific device"""
+    try:
+        ref = firebase_db.reference(layout.device_path(device_id, "gesture"))
+        return ref.get() or {}
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@api_router.get("/devices/{device_id}/status")
+async def get_device_status_data(device_id: str):
+    """Get status data for a specific device"""
+    try:
+        ref = firebase_db.reference(layout.device_path(device_id, "status"))
+        return ref.get() or {}
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+# Legacy endpoints (for backward compatibility)
+@api_router.post("/iot/sensor-data")
+async def create_sensor_data(data: SensorDataCreate = Depends(sensor_reading_body)):
+    """Store a reading (already validated by sensor_reading_body) and acknowledge it"""
+    priority = reading_priority(data)
+    admit_ingest(data.device_id, priority)
+    try:
+        reading_id, record = sensor_record(data)
+        
+        # Save to Firebase (per-device index, plus the legacy log in the flat
+        # layout), queued in the local spool
+        updates = {layout.readings_path(data.device_id, reading_id): record}
+        if not layout.sharded:
+            updates[f"sensor_data/{reading_id}"] = record
+        persist(updates)
+        event_bus.publish(f"ingest/{data.device_id}", record)
+        feedback = coach(data.device_id, data.compression_rate, data.compression_depth, data.pressure)
+        
+        return FastJSONResponse({
+            "status": "success",
+            "id": reading_id,
+            "timestamp": record["timestamp"],
+            "next_interval_ms": next_interval_ms(data.device_id, priority),
+            "feedback": feedback,
+        })
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 @api_router.get("/iot/latest")
 async def get_latest_sensor_data(device_id: str):
     try:
-        ref = firebase_db.reference("sensor_data")
-        data = ref.order_by_child("device_id").equal_to(device_id).limit_to_last(1).get()
-        if data.val():
-            return {"status": "success", "data": data.val()}
+        ref = firebase_db.reference(layout.readings_path(device_id))
+        data = ref.order_by_key().limit_to_last(1).get()
+        if data:
+            return {"status": "success", "data": data}
         return {"status": "not_found"}
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 @api_router.get("/iot/stream")
-async def stream_sensor_data(device_id: str):
-    async def event_generator():
-        try:
-            ref = firebase_db.reference(f"sensor_data")
-            
-            async def on_value(msg):
-                data = msg["data"]
-                if data:
-                    yield f"data: {json.dumps(data)}\n\n"
-            
-            # Stream data
-            while True:
-                data = ref.order_by_child("device_id").equal_to(device_id).limit_to_last(5).get()
-                if data.val():
-                    yield f"data: {json.dumps(data.val())}\n\n"
-                await asyncio.sleep(2)
-        except Exception as e:
-            logger.error(f"Stream error: {e}")
-    
-    return StreamingResponse(event_generator(), media_type="text/event-stream")
+async def stream_sensor_data(device_id: str, policy: str = Query(DROP_OLDEST, pattern=STREAM_POLICY_PATTERN)):
+    # Readings ingested by any worker arrive over the event bus; poll
+    # Firebase only when the bus has been quiet.
+    async def poll():
+        return await stream_polls.do(f"stream/{device_id}", _poll_readings, device_id)
+
+    events = live_events(
+        event_bus, f"ingest/{device_id}", policy,
+        encode=lambda record: sse_event(dumps({record["id"]: record})),
+        poll=poll, poll_seconds=STREAM_POLL_SECONDS,
+    )
+    return StreamingResponse(events, media_type="text/event-stream")
+
+@api_router.get("/devices/{device_id}/feedback/stream")
+async def stream_cpr_feedback(device_id: str, policy: str = Query(CONFLATE, pattern=STREAM_POLICY_PATTERN)):
+    """Live CPR coaching cues for one device, as computed on ingest by any worker"""
+    events = live_events(event_bus, f"feedback/{device_id}", policy)
+    return StreamingResponse(events, media_type="text/event-stream")
+
+@api_router.get("/devices/liveness/stream")
+async def stream_device_liveness(policy: str = Query(CONFLATE, pattern=STREAM_POLICY_PATTERN)):
+    """Devices coming online or going silent, as detected by the liveness tracker"""
+    events = live_events(event_bus, "liveness", policy, key=lambda event: event["device_id"])
+    return StreamingResponse(events, media_type="text/event-stream")
+
+@api_router.get("/streams/stats")
+async def get_stream_stats():
+    """Live stream subscribers and events dropped/conflated for slow consumers"""
+    return event_bus.stats()
 
 # ============= DEVICE ENDPOINTS =============
 
@@ -218,67 +744,127 @@ async def create_device(device: DeviceCreate, authorization: str = Header(None))
     
     try:
         uid = verify_firebase_token(authorization)
-        new_device = Device(device_name=device.device_name, location=device.location)
-        ref = firebase_db.reference(f"devices/{new_device.id}")
-        ref.set({
+        new_device = Device(
+            device_name=device.device_name, location=device.location, organization=device.organization
+        )
+        record = {
             "id": new_device.id,
             "device_name": new_device.device_name,
             "status": new_device.status,
             "battery_level": new_device.battery_level,
             "signal_strength": new_device.signal_strength,
             "last_sync": new_device.last_sync.isoformat(),
-            "location": new_device.location
+            "location": new_device.location,
+            "organization": new_device.organization
+        }
+        # Device, its shard directory entry and its organization's analytics
+        # in one multi-path write
+        shard, directory = layout.assign(DEVICES, new_device.id, new_device.organization)
+        firebase_db.reference("/").update({
+            layout.path(DEVICES, shard, new_device.id): record, **directory, **device_registered(record),
         })
         return new_device
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
+def _device_records(pairs):
+    for key, value in pairs:
+        if not isinstance(value, dict) or "device_name" not in value:
+            # Nodes created by the firmware alone have no registration fields
+            continue
+        if isinstance(value.get("status"), dict):
+            # Sectioned ingest stores the firmware's status report under the same
+            # key as the registration status; a reporting device is active
+            value = {**value, "status": "active"}
+        try:
+            yield Device.model_validate(value).model_dump(mode="json")
+        except ValidationError as e:
+            logger.warning(f"Skipping invalid device record {key}: {e}")
+
 @api_router.get("/devices", response_model=List[Device])
-async def get_devices(authorization: str = Header(None)):
+async def get_devices(request: Request, authorization: str = Header(None)):
+    """List devices, streamed page by page (NDJSON on request)"""
     if not authorization:
         raise HTTPException(status_code=401, detail="No authorization header")
     
     try:
         uid = verify_firebase_token(authorization)
-        ref = firebase_db.reference("devices")
-        data = ref.get()
-        if data:
-            return list(data.values())
-        return []
+        devices = _device_records(layout.iter_collection(DEVICES))
+        if wants_ndjson(request):
+            return await streamed_response(request, ndjson_chunks(devices), NDJSON_MEDIA_TYPE)
+        return await streamed_response(request, json_array_chunks(devices))
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@api_router.post("/devices/batch-get")
+async def batch_get_devices(request: DeviceBatchGet):
+    """Read several sub-paths of many devices concurrently in one request"""
+    for name in (*request.device_ids, *request.paths):
+        if not PATH_PATTERN.match(name):
+            raise HTTPException(status_code=400, detail=f"Invalid device id or path: {name!r}")
+    try:
+        devices, hits = await batch_get(
+            list(dict.fromkeys(request.device_ids)),
+            list(dict.fromkeys(request.paths)),
+            read_cache,
+            BATCH_GET_CONCURRENCY,
+        )
+        return FastJSONResponse({"devices": devices, "cache_hits": hits})
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 @api_router.get("/devices/{device_id}")
-async def get_device(device_id: str):
+async def get_device(device_id: str, request: Request):
+    resource = f"devices/{device_id}"
+    cached = conditional_cache.not_modified_response(request, resource)
+    if cached is not None:
+        return cached
     try:
-        ref = firebase_db.reference(f"devices/{device_id}")
-        data = ref.get()
-        return data.val() if data.val() else {}
+        ref = firebase_db.reference(layout.device_path(device_id))
+        data = ref.get() or {}
+        return conditional_cache.respond(request, resource, data)
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 @api_router.put("/devices/{device_id}")
 async def update_device(device_id: str, device: DeviceCreate):
     try:
-        ref = firebase_db.reference(f"devices/{device_id}")
-        ref.update(device.model_dump(exclude_unset=True))
+        changes = device.model_dump(exclude_unset=True)
+        device_path = layout.device_path(device_id)
+        current = firebase_db.reference(device_path).get() or {}
+        if layout.by_org and "organization" in changes and changes["organization"] != current.get("organization"):
+            raise HTTPException(
+                status_code=409,
+                detail="Devices are sharded by organization; re-register the device to move it",
+            )
+        updates = {f"{device_path}/{name}": value for name, value in changes.items()}
+        if current:
+            updates.update(device_changed(current, {**current, **changes}))
+        firebase_db.reference("/").update(updates)
+        resource_changed(f"devices/{device_id}")
         return {"status": "success"}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
+def _devices_health():
+    # Shard by shard (concurrently), so no single read spans the whole fleet
+    devices = []
+    for data in read_shards(DEVICES, concurrency=BATCH_GET_CONCURRENCY):
+        devices.extend(data.values() if data else [])
+    
+    return {
+        "total_devices": len(devices),
+        "active_devices": sum(1 for d in devices if d.get("status") == "active"),
+        "battery_average": sum(d.get("battery_level", 100) for d in devices) / len(devices) if devices else 0,
+        "signal_average": sum(d.get("signal_strength", 100) for d in devices) / len(devices) if devices else 0
+    }
+
 @api_router.get("/devices/health/overview")
 async def get_devices_health():
     try:
-        ref = firebase_db.reference("devices")
-        data = ref.get()
-        devices = list(data.val().values()) if data.val() else []
-        
-        return {
-            "total_devices": len(devices),
-            "active_devices": sum(1 for d in devices if d.get("status") == "active"),
-            "battery_average": sum(d.get("battery_level", 100) for d in devices) / len(devices) if devices else 0,
-            "signal_average": sum(d.get("signal_strength", 100) for d in devices) / len(devices) if devices else 0
-        }
+        return await overviews.do("devices/overview", _devices_health)
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
@@ -287,63 +873,192 @@ async def get_devices_health():
 @api_router.post("/sessions", response_model=Session)
 async def create_session(session: SessionCreate):
     try:
-        new_session = Session(device_id=session.device_id, location=session.location)
-        ref = firebase_db.reference(f"sessions/{new_session.id}")
-        ref.set(new_session.model_dump())
+        organization = await asyncio.to_thread(
+            lambda: firebase_db.reference(layout.device_path(session.device_id, "organization")).get()
+        )
+        new_session = Session(device_id=session.device_id, location=session.location, organization=organization)
+        shard, directory = layout.assign(SESSIONS, new_session.id, organization)
+        firebase_db.reference("/").update({
+            layout.path(SESSIONS, shard, new_session.id): new_session.model_dump(mode="json"),
+            **directory,
+            **session_started(organization),
+        })
+        resource_changed("sessions")
+        event_bus.publish("session", {
+            "id": new_session.id,
+            "device_id": new_session.device_id,
+            "start_ms": int(new_session.start_time.timestamp() * 1000),
+            "status": "active",
+        })
         return new_session
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 @api_router.get("/sessions", response_model=List[Session])
-async def get_sessions(authorization: str = Header(None), limit: int = 100):
+async def get_sessions(request: Request, authorization: str = Header(None), limit: int = 100):
     if not authorization:
         raise HTTPException(status_code=401, detail="No authorization header")
-        
+    
     try:
         uid = verify_firebase_token(authorization)
-        ref = firebase_db.reference("sessions")
-        data = ref.limit_to_last(limit).get()
-        if data:
-            return list(data.values())
-        return []
+        variant = str(limit)
+        cached = conditional_cache.not_modified_response(request, "sessions", variant)
+        if cached is not None:
+            return cached
+        records = []
+        shards = await asyncio.to_thread(
+            read_shards, SESSIONS, lambda ref: ref.limit_to_last(limit).get(), BATCH_GET_CONCURRENCY
+        )
+        for data in shards:
+            records.extend((data or {}).values())
+        if len(records) > limit:
+            # Several shards: keep the most recently started sessions
+            records = sorted(records, key=lambda s: s.get("start_time") or "")[-limit:]
+        sessions = [Session.model_validate(s).model_dump(mode="json") for s in records]
+        return conditional_cache.respond(request, "sessions", sessions, variant)
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 @api_router.get("/sessions/{session_id}")
-async def get_session(session_id: str):
+async def get_session(session_id: str, request: Request):
+    resource = f"sessions/{session_id}"
+    cached = conditional_cache.not_modified_response(request, resource)
+    if cached is not None:
+        return cached
     try:
-        ref = firebase_db.reference(f"sessions/{session_id}")
-        data = ref.get()
-        return data.val() if data.val() else {}
+        ref = firebase_db.reference(layout.session_path(session_id))
+        data = ref.get() or {}
+        return conditional_cache.respond(request, resource, data)
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 @api_router.put("/sessions/{session_id}")
 async def update_session(session_id: str, session: SessionCreate):
     try:
-        ref = firebase_db.reference(f"sessions/{session_id}")
+        ref = firebase_db.reference(layout.session_path(session_id))
         ref.update(session.model_dump(exclude_unset=True))
+        resource_changed(f"sessions/{session_id}")
+        resource_changed("sessions")
         return {"status": "success"}
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
+async def spool_settled(timeout):
+    """Wait (bounded) until spooled writes reached Firebase, so reads see them"""
+    deadline = asyncio.get_running_loop().time() + timeout
+    while spool.is_open and spool.pending and asyncio.get_running_loop().time() < deadline:
+        await asyncio.sleep(0.1)
+
+@api_router.post("/sessions/{session_id}/close")
+async def close_session(session_id: str, include_samples: bool = False):
+    """Mark a session completed, write its summary and build its replay index"""
+    try:
+        session_path = layout.session_path(session_id)
+        data = firebase_db.reference(session_path).get()
+        if not data:
+            raise HTTPException(status_code=404, detail="Session not found")
+        session = Session.model_validate(data)
+        session.end_time = session.end_time or datetime.now(timezone.utc)
+        session.duration = int((session.end_time - session.start_time).total_seconds())
+        session.status = "completed"
+
+        record = session.model_dump(mode="json")
+        record["progress"] = None
+        # Stop buffering first, so this worker's stats flush leaves the session alone
+        buffer = session_tracker.end(session_id)
+        if buffer is not None:
+            record.update(buffer.stats())
+            record["summary"] = buffer.summary()
+            if include_samples:
+                firebase_db.reference(f"session_samples/{session_id}").set(buffer.blob())
+
+        await spool_settled(timeout=5)
+        samples, _ = await asyncio.to_thread(
+            build_replay_index, session_id, session.device_id, session.start_time, session.end_time
+        )
+        updates = {f"{session_path}/{name}": value for name, value in record.items()}
+        updates[f"{session_path}/replay_samples"] = samples
+        if data.get("status") != "completed":
+            # Closing twice must not count the session twice
+            updates.update(session_completed(session.organization, record))
+        firebase_db.reference("/").update(updates)
+        event_bus.publish("session", {"id": session_id, "status": "completed"})
+        resource_changed(f"sessions/{session_id}")
+        resource_changed("sessions")
+        return {"status": "success", "replay_samples": samples, "summary": record.get("summary")}
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@api_router.get("/sessions/{session_id}/replay")
+async def replay_session(
+    session_id: str,
+    speed: float = Query(1.0, gt=0, le=100, description="playback speed (1 = real time)"),
+    start: int = Query(0, ge=0, description="offset from the session start in ms"),
+):
+    """Replay a closed session's samples over SSE at real time or N× speed"""
+    try:
+        data = firebase_db.reference(layout.session_path(session_id)).get()
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if not data:
+        raise HTTPException(status_code=404, detail="Session not found")
+    if "replay_samples" not in data:
+        raise HTTPException(status_code=409, detail="Session has no replay index; close it first")
+
+    async def event_generator():
+        samples = iter_replay(session_id, start)
+        loop = asyncio.get_running_loop()
+        began = loop.time()
+        try:
+            while True:
+                # One index page per thread hop; pacing happens between samples
+                page = await asyncio.to_thread(lambda: list(islice(samples, REPLAY_PAGE_SIZE)))
+                for sample in page:
+                    delay = (sample["offset_ms"] - start) / 1000 / speed - (loop.time() - began)
+                    if delay > 0:
+                        await asyncio.sleep(delay)
+                    yield sse_event(dumps(sample))
+                if len(page) < REPLAY_PAGE_SIZE:
+                    break
+            yield sse_event(b"{}", event="end")
+        except Exception as e:
+            logger.error(f"Replay error: {e}")
+    
+    return StreamingResponse(event_generator(), media_type="text/event-stream")
+
+def _sessions_analytics():
+    sessions = []
+    for data in read_shards(SESSIONS, concurrency=BATCH_GET_CONCURRENCY):
+        sessions.extend(data.values() if data else [])
+    
+    return {
+        "total_sessions": len(sessions),
+        "active_sessions": sum(1 for s in sessions if s.get("status") == "active"),
+        "average_compressions": sum(s.get("total_compressions", 0) for s in sessions) / len(sessions) if sessions else 0,
+        "average_quality": sum(s.get("quality_score", 0) for s in sessions) / len(sessions) if sessions else 0
+    }
+
 @api_router.get("/sessions/analytics/overview")
 async def get_analytics(authorization: str = Header(None)):
     if not authorization:
         raise HTTPException(status_code=401, detail="No authorization header")
-        
+    
     try:
         uid = verify_firebase_token(authorization)
-        ref = firebase_db.reference("sessions")
-        data = ref.get()
-        sessions = list(data.values()) if data else []
-        
-        return {
-            "total_sessions": len(sessions),
-            "active_sessions": sum(1 for s in sessions if s.get("status") == "active"),
-            "average_compressions": sum(s.get("total_compressions", 0) for s in sessions) / len(sessions) if sessions else 0,
-            "average_quality": sum(s.get("quality_score", 0) for s in sessions) / len(sessions) if sessions else 0
-        }
+        return await overviews.do("sessions/overview", _sessions_analytics)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+# ============= ORGANIZATION ENDPOINTS =============
+
+@api_router.get("/orgs/{organization}/analytics")
+async def get_org_analytics(organization: str):
+    """Materialized session and device analytics of one organization (a single node read)"""
+    try:
+        totals = await asyncio.to_thread(firebase_db.reference(f"org_analytics/{org_key(organization)}").get)
+        return org_view(organization, totals)
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
@@ -351,34 +1066,70 @@ async def get_analytics(authorization: str = Header(None)):
 
 @api_router.post("/emergency/signal", response_model=EmergencySignal)
 async def create_emergency(emergency: dict):
+    received_at = time.perf_counter()
     try:
         new_emergency = EmergencySignal(
             device_id=emergency.get("device_id", ""),
             location=emergency.get("location", ""),
+            organization=emergency.get("organization"),
             status=emergency.get("status", "active")
         )
+        if new_emergency.organization is None and new_emergency.device_id:
+            new_emergency.organization = await asyncio.to_thread(
+                lambda: firebase_db.reference(layout.device_path(new_emergency.device_id, "organization")).get()
+            )
+        record = new_emergency.model_dump(mode="json")
         ref = firebase_db.reference(f"emergencies/{new_emergency.id}")
-        ref.set(new_emergency.model_dump())
+        ref.set(record)
+        event_bus.publish("emergency", record)
+
+        # The emergency is stored: a failed fan-out must not fail the request,
+        # or a retrying client would raise the same emergency twice
+        try:
+            alerted, latency_ms = await notifier.dispatch(record, new_emergency.organization, received_at)
+            new_emergency.responders_alerted = alerted
+            record.update(responders_alerted=alerted, dispatch_ms=round(latency_ms, 1))
+            ref.update({"responders_alerted": alerted, "dispatch_ms": record["dispatch_ms"]})
+            event_bus.publish("emergency", record)
+            logger.info(f"Emergency {new_emergency.id}: {alerted} responders alerted in {latency_ms:.0f} ms")
+        except Exception as e:
+            logger.error(f"Emergency {new_emergency.id}: responder dispatch failed: {e}")
         return new_emergency
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
+@api_router.get("/emergency/dispatch/stats")
+async def get_dispatch_stats():
+    """Responder fan-out counters and dispatch latency"""
+    return notifier.stats()
+
+def _active_emergencies():
+    data = firebase_db.reference("emergencies").order_by_child("status").equal_to("active").get()
+    return list(data.values()) if data else []
+
 @api_router.get("/emergency/active")
 async def get_active_emergencies():
     try:
-        ref = firebase_db.reference("emergencies")
-        data = ref.order_by_child("status").equal_to("active").get()
-        if data.val():
-            return list(data.val().values())
-        return []
+        return await overviews.do("emergency/active", _active_emergencies)
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
+@api_router.get("/emergency/stream")
+async def stream_emergencies(policy: str = Query(CONFLATE, pattern=STREAM_POLICY_PATTERN)):
+    """Live emergency changes from every worker, starting with the active list"""
+    def initial():
+        return sse_event(dumps(_active_emergencies()))
+
+    # Conflation keeps the latest state of each emergency for slow viewers
+    events = live_events(event_bus, "emergency", policy, key=lambda event: event.get("id"), initial=initial)
+    return StreamingResponse(events, media_type="text/event-stream")
+
 @api_router.put("/emergency/{emergency_id}")
 async def update_emergency(emergency_id: str, emergency: dict):
     try:
         ref = firebase_db.reference(f"emergencies/{emergency_id}")
         ref.update(emergency)
+        event_bus.publish("emergency", {"id": emergency_id, **emergency})
         return {"status": "success"}
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
@@ -386,15 +1137,19 @@ async def update_emergency(emergency_id: str, emergency: dict):
 # ============= SETTINGS ENDPOINTS =============
 
 @api_router.get("/settings")
-async def get_settings(authorization: str = Header(None)):
+async def get_settings(request: Request, authorization: str = Header(None)):
     if not authorization:
         raise HTTPException(status_code=401, detail="No authorization header")
     
     try:
         uid = verify_firebase_token(authorization)
-        ref = firebase_db.reference(f"users/{uid}")
-        data = ref.get()
-        return data.val() if data.val() else {}
+        resource = f"users/{uid}"
+        cached = conditional_cache.not_modified_response(request, resource)
+        if cached is not None:
+            return cached
+        ref = firebase_db.reference(resource)
+        data = ref.get() or {}
+        return conditional_cache.respond(request, resource, data)
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
@@ -407,12 +1162,36 @@ async def update_settings(settings: dict, authorization: str = Header(None)):
         uid = verify_firebase_token(authorization)
         ref = firebase_db.reference(f"users/{uid}")
         ref.update(settings)
+        resource_changed(f"users/{uid}")
         return {"status": "success", "message": "Settings updated"}
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
-# Include router
-app.include_router(api_router)
+# ============= APP FACTORY =============
+
+def create_app():
+    """Build the ASGI app (`uvicorn server:app` or `uvicorn server:create_app --factory`)"""
+    app = FastAPI(
+        title="ResqPulse API",
+        version="1.0.0",
+        lifespan=lifespan,
+        default_response_class=FastJSONResponse,
+    )
+
+    # CORS middleware
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=["*"],
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+    )
+
+    # Include router
+    app.include_router(api_router)
+    return app
+
+app = create_app()
 
 if __name__ == "__main__":
     import uvicorn
@@ -0,0 +1,157 @@
+"""
+In-memory accounting of active CPR sessions.
+
+While a session is active, the CPR part of every reading from its device
+(seen by every worker through the event bus) is added to a bounded buffer
+keyed by session id. Running totals are kept alongside, so the
+incremental stats written to the session record every few seconds and the
+summary written once at session end cost O(1) to produce. The buffer keeps
+the most recent max_samples samples for the optional compressed sample
+blob; totals always cover the whole session.
+
+The running counters are stored with the stats (progress), so a restarted
+worker resumes the session's totals instead of starting from zero.
+"""
+
+import base64
+import time
+import zlib
+from collections import OrderedDict, deque
+
+from fast_json import dumps
+
+RATE_TARGET = (100.0, 120.0)    # compressions/min
+DEPTH_TARGET = (5.0, 6.0)       # cm
+MAX_GAP_SECONDS = 1.0           # longer gaps are pauses, not compressions
+
+
+# Counters that make up a session's progress (restored after a restart)
+PROGRESS_FIELDS = (
+    "count", "compressions", "compressing", "rate_sum", "depth_sum", "quality_sum",
+    "rate_in_target", "depth_in_target", "longest_pause_ms", "last_compression_ms",
+)
+
+
+class SessionBuffer:
+    def __init__(self, session_id, device_id, started_ms, max_samples=36000):
+        self.session_id = session_id
+        self.device_id = device_id
+        self.started_ms = started_ms
+        self.samples = deque(maxlen=max_samples)    # (offset_ms, rate, depth, quality)
+        self.count = 0
+        self.compressions = 0.0
+        self.compressing = 0
+        self.rate_sum = 0.0
+        self.depth_sum = 0.0
+        self.quality_sum = 0.0
+        self.rate_in_target = 0
+        self.depth_in_target = 0
+        self.longest_pause_ms = 0
+        self.last_compression_ms = started_ms
+        self._last_ms = None
+        self.dirty = False
+
+    def add(self, now_ms, rate, depth, quality):
+        if self._last_ms is not None and rate > 0:
+            gap = min(MAX_GAP_SECONDS, max(0.0, (now_ms - self._last_ms) / 1000))
+            self.compressions += rate / 60 * gap
+        self._last_ms = now_ms
+        self.count += 1
+        self.samples.append((now_ms - self.started_ms, rate, depth, quality))
+        if rate > 0:
+            self.compressing += 1
+            self.rate_sum += rate
+            self.depth_sum += depth
+            self.quality_sum += quality
+            self.rate_in_target += RATE_TARGET[0] <= rate <= RATE_TARGET[1]
+            self.depth_in_target += DEPTH_TARGET[0] <= depth <= DEPTH_TARGET[1]
+            self.longest_pause_ms = max(self.longest_pause_ms, now_ms - self.last_compression_ms)
+            self.last_compression_ms = now_ms
+        self.dirty = True
+
+    def progress(self):
+        return {name: getattr(self, name) for name in PROGRESS_FIELDS}
+
+    def restore(self, progress):
+        """Continue from stored progress (totals before this worker started)"""
+        for name in PROGRESS_FIELDS:
+            value = progress.get(name)
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                setattr(self, name, value)
+
+    def stats(self):
+        """Fields of the session record kept current while it is active"""
+        n = self.compressing or 1
+        return {
+            "total_compressions": int(self.compressions),
+            "average_rate": round(self.rate_sum / n, 1),
+            "average_depth": round(self.depth_sum / n, 2),
+            "quality_score": round(self.quality_sum / n, 3),
+        }
+
+    def summary(self):
+        """Compact end-of-session summary"""
+        n = self.compressing or 1
+        return {
+            "samples": self.count,
+            "compressing_samples": self.compressing,
+            "rate_in_target": round(self.rate_in_target / n, 3),
+            "depth_in_target": round(self.depth_in_target / n, 3),
+            "longest_pause_ms": self.longest_pause_ms,
+        }
+
+    def blob(self):
+        """Buffered samples as zlib-compressed, base64-encoded column arrays"""
+        columns = {"offset_ms": [], "rate": [], "depth": [], "quality": []}
+        for offset, rate, depth, quality in self.samples:
+            columns["offset_ms"].append(offset)
+            columns["rate"].append(rate)
+            columns["depth"].append(depth)
+            columns["quality"].append(quality)
+        return {
+            "encoding": "json+zlib+base64",
+            "truncated": self.count > len(self.samples),
+            "data": base64.b64encode(zlib.compress(dumps(columns), 9)).decode("ascii"),
+        }
+
+
+class SessionTracker:
+    def __init__(self, max_samples=36000, max_sessions=10000):
+        self.max_samples = max_samples
+        self.max_sessions = max_sessions
+        self._by_id = OrderedDict()
+        self._by_device = {}
+
+    def start(self, session_id, device_id, started_ms, progress=None):
+        if session_id in self._by_id:
+            return
+        if len(self._by_id) >= self.max_sessions:
+            self.end(next(iter(self._by_id)))
+        buffer = SessionBuffer(session_id, device_id, started_ms, self.max_samples)
+        if progress:
+            buffer.restore(progress)
+        self._by_id[session_id] = buffer
+        self._by_device[device_id] = buffer
+
+    def end(self, session_id):
+        """Stop tracking a session; returns its buffer (None if unknown)"""
+        buffer = self._by_id.pop(session_id, None)
+        if buffer is not None and self._by_device.get(buffer.device_id) is buffer:
+            del self._by_device[buffer.device_id]
+        return buffer
+
+    def get(self, session_id):
+        return self._by_id.get(session_id)
+
+    def add_reading(self, device_id, rate, depth, quality, now_ms=None):
+        buffer = self._by_device.get(device_id)
+        if buffer is not None:
+            now_ms = int(time.time() * 1000) if now_ms is None else now_ms
+            buffer.add(now_ms, float(rate or 0), float(depth or 0), float(quality or 0))
+
+    def take_dirty(self):
+        """Buffers that received samples since the last call"""
+        dirty = [buffer for buffer in self._by_id.values() if buffer.dirty]
+        for buffer in dirty:
+            buffer.dirty = False
+        return dirty
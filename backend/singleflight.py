@@ -0,0 +1,57 @@
+"""
+Single-flight coalescing for expensive, identical reads.
+
+Concurrent callers asking for the same key share one upstream call: the
+first starts it as a task, later ones await the same task. The result can
+be kept for a short micro-cache window (ttl_seconds) so a dashboard herd
+arriving just after it finished is served from memory too. Failures are
+shared by the waiters of that call but never cached.
+"""
+
+import asyncio
+import time
+
+
+class SingleFlight:
+    def __init__(self, ttl_seconds=0.0):
+        self.ttl_seconds = ttl_seconds
+        self._inflight = {}
+        self._results = {}
+        self._generation = 0
+        self.calls = 0
+        self.coalesced = 0
+
+    def invalidate(self, key=None):
+        """Drop the cached result for key (all keys when None)"""
+        # Reads already in flight may predate the write: don't cache what they return
+        self._generation += 1
+        if key is None:
+            self._results.clear()
+        else:
+            self._results.pop(key, None)
+
+    async def do(self, key, fn, *args):
+        """Run the blocking fn(*args) in a thread once for all concurrent callers of key"""
+        cached = self._results.get(key)
+        if cached is not None and time.monotonic() - cached[1] <= self.ttl_seconds:
+            self.coalesced += 1
+            return cached[0]
+
+        task = self._inflight.get(key)
+        if task is None:
+            self.calls += 1
+            task = asyncio.ensure_future(asyncio.to_thread(fn, *args))
+            self._inflight[key] = task
+            generation = self._generation
+            task.add_done_callback(lambda done: self._finish(key, done, generation))
+        else:
+            self.coalesced += 1
+        # shield: a client disconnecting must not cancel the read the others wait on
+        return await asyncio.shield(task)
+
+    def _finish(self, key, task, generation):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if self.ttl_seconds > 0 and generation == self._generation \
+                and not task.cancelled() and task.exception() is None:
+            self._results[key] = (task.result(), time.monotonic())
@@ -0,0 +1,448 @@
+"""
+Durable local spool for ingest writes.
+
+Ingest endpoints append their Firebase writes ({path: value} multi-path
+updates) to an append-only log of memory-mapped segment files and return
+immediately. A background replayer drains the log to Firebase in merged
+batches, retrying with exponential backoff and full jitter behind a circuit
+breaker, and only advances the persisted cursor once a batch is written.
+Readings survive Firebase outages and process restarts. A write Firebase
+rejects as malformed (a bad path or value) is never retried: it is moved to
+dead-letter.ndjson next to the log so it cannot block the writes behind it.
+Paths are checked with check_paths before they are queued.
+
+Record layout inside a segment: <u32 length><u32 crc32><payload JSON>.
+A zero length marks the end of the written data; a bad checksum marks a
+torn write from a crash and is treated the same way.
+
+Each worker claims a numbered slot directory under SPOOL_DIR with an
+exclusive lock, so a restarted worker adopts (and drains) whatever spool
+a previous process left behind. Slots no worker claims any more (the pool
+shrank) are adopted at startup with adopt_orphans and drained until empty.
+"""
+
+import asyncio
+import logging
+import mmap
+import os
+import random
+import re
+import struct
+import time
+import zlib
+from pathlib import Path
+
+from fast_json import dumps, loads
+
+try:
+    import fcntl
+except ImportError:  # Windows: one spool per process id instead of shared slots
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+SEGMENT_BYTES = 16 * 1024 * 1024
+MAX_SEGMENTS = 64
+MAX_SLOTS = 64
+
+_RECORD_HEADER = struct.Struct("<II")
+_CURSOR_FILE = "cursor"
+_LOCK_FILE = "lock"
+_DEAD_LETTER_FILE = "dead-letter.ndjson"
+
+# Firebase keys cannot be empty or contain . $ # [ ] or ASCII control characters
+_INVALID_KEY = re.compile(r"[.$#\[\]\x00-\x1f\x7f]")
+
+
+class SpoolFull(Exception):
+    """Raised when the spool reached MAX_SEGMENTS (upstream down for too long)"""
+
+
+class InvalidPath(ValueError):
+    """Raised for a multi-path update Firebase would reject"""
+
+
+def check_paths(updates):
+    """Raise InvalidPath unless every path of a multi-path update is a valid Firebase path"""
+    for path in updates:
+        keys = path.strip("/").split("/")
+        if not all(keys) or any(_INVALID_KEY.search(key) for key in keys):
+            raise InvalidPath(f"Invalid Firebase path: {path!r}")
+
+
+def is_poison(error):
+    """True for write errors no retry can fix (Firebase rejected the path or value)"""
+    # Not every ValueError: a broken credentials file raises one too, and is fixed by a redeploy
+    if isinstance(error, InvalidPath):
+        return True
+    response = getattr(error, "http_response", None)
+    return getattr(response, "status_code", None) == 400 or getattr(error, "code", None) == "INVALID_ARGUMENT"
+
+
+class Spool:
+    def __init__(self, directory, segment_bytes=SEGMENT_BYTES, max_segments=MAX_SEGMENTS):
+        self.root = Path(directory)
+        self.segment_bytes = segment_bytes
+        self.max_segments = max_segments
+        self.directory = None
+        self.pending = 0
+        self.dead_lettered = 0
+        self._lock_fd = None
+        self._segment = None
+        self._file = None
+        self._map = None
+        self._offset = 0
+        self._cursor = (0, 0)
+        self._data_ready = None
+
+    @property
+    def is_open(self):
+        return self._map is not None
+
+    # ============= LIFECYCLE =============
+
+    def open(self, directory=None):
+        """Claim a slot directory (the first free one by default), load the cursor and find the end of the log"""
+        self.root.mkdir(parents=True, exist_ok=True)
+        if directory is None:
+            self.directory = self._claim_slot()
+        elif self._lock(Path(directory)):
+            self.directory = Path(directory)
+        else:
+            raise RuntimeError(f"Spool slot {directory} is in use")
+        self._data_ready = asyncio.Event()
+
+        cursor_path = self.directory / _CURSOR_FILE
+        if cursor_path.exists():
+            segment, offset = cursor_path.read_text().split()
+            self._cursor = (int(segment), int(offset))
+
+        segments = self._segments()
+        self._map_segment(segments[-1] if segments else self._cursor[0])
+        self._offset = self._scan_end()
+        self.pending = sum(1 for _ in self._iter_records(self._cursor, None))
+        if self.pending:
+            logger.info(f"Spool {self.directory} has {self.pending} unreplayed writes")
+            self._data_ready.set()
+
+    def close(self):
+        if self._map is not None:
+            self._map.flush()
+            self._map.close()
+            self._file.close()
+            self._map = self._file = None
+        if self._lock_fd is not None:
+            os.close(self._lock_fd)
+            self._lock_fd = None
+
+    def _claim_slot(self):
+        if fcntl is None:
+            directory = self.root / f"pid-{os.getpid()}"
+            directory.mkdir(exist_ok=True)
+            return directory
+        for slot in range(MAX_SLOTS):
+            directory = self.root / f"slot-{slot}"
+            directory.mkdir(exist_ok=True)
+            if self._lock(directory):
+                return directory
+        raise RuntimeError(f"No free spool slot under {self.root}")
+
+    def _lock(self, directory):
+        fd = os.open(directory / _LOCK_FILE, os.O_RDWR | os.O_CREAT)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            return False
+        self._lock_fd = fd
+        return True
+
+    def adopt_orphans(self):
+        """Open the unclaimed slots that still hold unreplayed writes; returns their spools"""
+        orphans = []
+        if fcntl is None:
+            return orphans
+        for directory in sorted(self.root.glob("slot-*")):
+            if directory == self.directory or not any(directory.glob("*.log")):
+                continue
+            orphan = Spool(self.root, self.segment_bytes, self.max_segments)
+            try:
+                orphan.open(directory)
+            except RuntimeError:
+                continue    # claimed by a running worker
+            except (OSError, ValueError) as e:
+                orphan.close()
+                logger.warning(f"Could not adopt spool {directory}: {e}")
+                continue
+            if orphan.pending:
+                orphans.append(orphan)
+            else:
+                orphan.close()
+        return orphans
+
+    def _segment_path(self, segment):
+        return self.directory / f"{segment:08d}.log"
+
+    def _segments(self):
+        return sorted(int(path.stem) for path in self.directory.glob("*.log"))
+
+    def _map_segment(self, segment):
+        if self._map is not None:
+            self._map.flush()
+            self._map.close()
+            self._file.close()
+        path = self._segment_path(segment)
+        self._file = open(path, "r+b" if path.exists() else "w+b")
+        if os.fstat(self._file.fileno()).st_size < self.segment_bytes:
+            self._file.truncate(self.segment_bytes)
+        self._map = mmap.mmap(self._file.fileno(), self.segment_bytes)
+        self._segment = segment
+
+    def _scan_end(self):
+        offset = self._cursor[1] if self._cursor[0] == self._segment else 0
+        for _, end in self._iter_segment(self._segment, offset):
+            offset = end
+        return offset
+
+    # ============= WRITING =============
+
+    def append(self, updates):
+        """Durably queue a multi-path update; returns as soon as it is in the log"""
+        payload = dumps(updates)
+        record = _RECORD_HEADER.pack(len(payload), zlib.crc32(payload)) + payload
+        if len(record) + _RECORD_HEADER.size > self.segment_bytes:
+            raise ValueError("Write too large for the spool")
+
+        if self._offset + len(record) + _RECORD_HEADER.size > self.segment_bytes:
+            if len(self._segments()) >= self.max_segments:
+                raise SpoolFull(f"Spool {self.directory} is full")
+            self._map_segment(self._segment + 1)
+            self._offset = 0
+
+        self._map[self._offset:self._offset + len(record)] = record
+        self._offset += len(record)
+        self.pending += 1
+        self._data_ready.set()
+
+    def flush(self):
+        """Push dirty pages to disk (the page cache already survives process crashes)"""
+        if self._map is not None:
+            self._map.flush()
+
+    # ============= READING =============
+
+    def _iter_segment(self, segment, offset):
+        """Yield (payload, end_offset) for the records of one segment starting at offset"""
+        path = self._segment_path(segment)
+        if not path.exists():
+            return
+        with open(path, "rb") as f:
+            while offset + _RECORD_HEADER.size <= self.segment_bytes:
+                f.seek(offset)
+                length, checksum = _RECORD_HEADER.unpack(f.read(_RECORD_HEADER.size))
+                if length == 0:
+                    return
+                payload = f.read(length)
+                if len(payload) != length or zlib.crc32(payload) != checksum:
+                    return
+                offset += _RECORD_HEADER.size + length
+                yield payload, offset
+
+    def _iter_records(self, start, limit):
+        """Yield (updates, position after it) from start, across segments"""
+        segment, offset = start
+        count = 0
+        while segment <= self._segment:
+            for payload, end in self._iter_segment(segment, offset):
+                yield loads(payload), (segment, end)
+                count += 1
+                if limit is not None and count >= limit:
+                    return
+            segment, offset = segment + 1, 0
+
+    def read_batch(self, max_records):
+        """Return [(updates, position after it)] from the cursor"""
+        return list(self._iter_records(self._cursor, max_records))
+
+    def commit(self, position, count):
+        """Advance the cursor past a replayed batch and drop finished segments"""
+        self._cursor = position
+        cursor_path = self.directory / _CURSOR_FILE
+        tmp = cursor_path.with_suffix(".tmp")
+        tmp.write_text(f"{position[0]} {position[1]}")
+        tmp.replace(cursor_path)
+        for segment in self._segments():
+            if segment < position[0]:
+                self._segment_path(segment).unlink()
+        self.pending = max(0, self.pending - count)
+        if not self.pending:
+            self._data_ready.clear()
+
+    def dead_letter(self, updates, error):
+        """Set aside a write that can never succeed (commit past it separately)"""
+        entry = {"failed_at": int(time.time() * 1000), "error": str(error), "updates": updates}
+        with open(self.directory / _DEAD_LETTER_FILE, "ab") as f:
+            f.write(dumps(entry) + b"\n")
+        self.dead_lettered += 1
+
+    async def wait_for_data(self, timeout):
+        try:
+            await asyncio.wait_for(self._data_ready.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+
+# ============= REPLAY =============
+
+class CircuitBreaker:
+    """Open after `threshold` consecutive failures; allow one trial call after `cooldown` seconds"""
+
+    def __init__(self, threshold=5, cooldown=30.0):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at = None
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return "closed"
+        return "half-open" if time.monotonic() - self.opened_at >= self.cooldown else "open"
+
+    def allow(self):
+        return self.state != "open"
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+
+    def record_failure(self):
+        self.failures += 1
+        if self.failures >= self.threshold or self.opened_at is not None:
+            self.opened_at = time.monotonic()
+
+
+def merge_updates(batch):
+    """
+    Merge spooled multi-path updates into as few Firebase updates as possible.
+
+    Later writes to the same path win. A new update is started whenever a path
+    would be an ancestor or descendant of one already queued, which Firebase
+    rejects within a single multi-path update.
+    """
+    merged, current, prefixes = [], {}, set()
+    for updates in batch:
+        for path, value in updates.items():
+            path = path.strip("/")
+            parts = path.split("/")
+            ancestors = ("/".join(parts[:i]) for i in range(1, len(parts)))
+            conflict = path not in current and (
+                path in prefixes or any(ancestor in current for ancestor in ancestors)
+            )
+            if conflict:
+                merged.append(current)
+                current, prefixes = {}, set()
+            current[path] = value
+            prefixes.update("/".join(parts[:i]) for i in range(1, len(parts)))
+    if current:
+        merged.append(current)
+    return merged
+
+
+class SpoolReplayer:
+    def __init__(self, spool, write, batch_size=200, base_delay=0.5, max_delay=30.0, breaker=None):
+        self.spool = spool
+        self.write = write
+        self.batch_size = batch_size
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.breaker = breaker or CircuitBreaker()
+        self.replayed = 0
+        self._attempt = 0
+
+    def _backoff(self):
+        # Full jitter: uniform between 0 and the capped exponential delay
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** self._attempt)))
+
+    async def _write(self, batch):
+        for updates in merge_updates(batch):
+            await asyncio.to_thread(self.write, updates)
+
+    async def _replay(self, records):
+        """Write and commit [(updates, position)]; raises on retryable failures"""
+        try:
+            await self._write([updates for updates, _ in records])
+        except Exception as e:
+            if not is_poison(e):
+                raise
+            logger.warning(f"Spool batch rejected, replaying it record by record: {e}")
+        else:
+            self.spool.commit(records[-1][1], len(records))
+            self.replayed += len(records)
+            return
+
+        # Find the malformed records; everything else is written in order
+        for updates, position in records:
+            try:
+                await self._write([updates])
+            except Exception as e:
+                if not is_poison(e):
+                    raise
+                logger.error(f"Spool write rejected by Firebase, moved to the dead-letter file: {e}")
+                self.spool.dead_letter(updates, e)
+            else:
+                self.replayed += 1
+            self.spool.commit(position, 1)
+
+    async def run(self, until_empty=False):
+        last_flush = time.monotonic()
+        while not (until_empty and not self.spool.pending):
+            await self.spool.wait_for_data(timeout=1.0)
+            if time.monotonic() - last_flush > 1.0:
+                self.spool.flush()
+                last_flush = time.monotonic()
+
+            if not self.spool.pending:
+                continue
+            if not self.breaker.allow():
+                await asyncio.sleep(1.0)
+                continue
+
+            records = self.spool.read_batch(self.batch_size)
+            if not records:
+                continue
+            try:
+                await self._replay(records)
+            except Exception as e:
+                self.breaker.record_failure()
+                self._attempt += 1
+                delay = self._backoff()
+                logger.warning(f"Spool replay failed ({self.spool.pending} pending, "
+                               f"breaker {self.breaker.state}), retrying in {delay:.1f}s: {e}")
+                await asyncio.sleep(delay)
+                continue
+
+            self.breaker.record_success()
+            self._attempt = 0
+
+    async def drain(self, timeout):
+        """Best-effort flush of pending writes before shutdown"""
+        deadline = time.monotonic() + timeout
+        while self.spool.pending and self.breaker.allow() and time.monotonic() < deadline:
+            records = self.spool.read_batch(self.batch_size)
+            if not records:
+                return
+            try:
+                await self._replay(records)
+            except Exception as e:
+                logger.warning(f"Spool drain stopped, {self.spool.pending} writes kept for next start: {e}")
+                return
+
+
+async def drain_orphan(spool, write):
+    """Replay an adopted spool until it is empty, then release its slot"""
+    try:
+        await SpoolReplayer(spool, write).run(until_empty=True)
+        logger.info(f"Drained orphaned spool {spool.directory}")
+    finally:
+        spool.close()
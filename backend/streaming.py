@@ -0,0 +1,223 @@
+"""
+Incremental, optionally compressed responses for large Firebase trees.
+
+Children of a node are read in key-ordered pages and encoded one at a time,
+so a request never holds more than one page in memory. Output is a chunked
+JSON object/array, or NDJSON when the client asks for application/x-ndjson.
+Bodies larger than COMPRESS_MIN_BYTES are compressed with brotli (when
+installed) or gzip, as negotiated by Accept-Encoding.
+
+Live server-sent event streams (live_events) read from a bounded event bus
+subscription, send a comment heartbeat when quiet so proxies and clients
+can tell a stalled connection from an idle one, and unsubscribe as soon as
+Starlette cancels the generator on client disconnect.
+"""
+
+import asyncio
+import logging
+import time
+import zlib
+
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import Response, StreamingResponse
+
+from fast_json import dumps, sse_event
+from firebase_admin_config import firebase_db
+
+try:
+    import brotli
+except ImportError:  # optional dependency
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+COMPRESS_MIN_BYTES = 1024
+PAGE_SIZE = 100
+HEARTBEAT_SECONDS = 15
+SSE_HEARTBEAT = b": heartbeat\n\n"
+
+
+def iter_children(path, page_size=PAGE_SIZE, start_after=None, end_at=None):
+    """Yield (key, value) for the children of path in key order, one page per read"""
+    last_key = start_after
+    while True:
+        query = firebase_db.reference(path).order_by_key()
+        if last_key is not None:
+            # start_at is inclusive: fetch one extra and skip the cursor itself
+            query = query.start_at(last_key)
+        if end_at is not None:
+            query = query.end_at(end_at)
+        page = query.limit_to_first(page_size + (last_key is not None)).get() or {}
+
+        count = 0
+        for key, value in page.items():
+            if key == last_key:
+                continue
+            count += 1
+            last_key = key
+            yield key, value
+        if count < page_size:
+            return
+
+
+# ============= ENCODERS =============
+
+def json_object_chunks(pairs):
+    """Encode (key, value) pairs as one JSON object, a member at a time"""
+    yield b"{"
+    separator = b""
+    for key, value in pairs:
+        yield separator + dumps(str(key)) + b":" + dumps(value)
+        separator = b","
+    yield b"}"
+
+
+def json_array_chunks(items):
+    """Encode items as one JSON array, an element at a time"""
+    yield b"["
+    separator = b""
+    for item in items:
+        yield separator + dumps(item)
+        separator = b","
+    yield b"]"
+
+
+def ndjson_chunks(items):
+    """Encode items as newline-delimited JSON"""
+    for item in items:
+        yield dumps(item) + b"\n"
+
+
+def wants_ndjson(request):
+    return NDJSON_MEDIA_TYPE in request.headers.get("accept", "")
+
+
+# ============= LIVE EVENTS =============
+
+def _json_frame(data):
+    return sse_event(dumps(data))
+
+
+async def live_events(bus, topic, policy, key=None, encode=_json_frame, initial=None, poll=None,
+                      poll_seconds=None, heartbeat_seconds=HEARTBEAT_SECONDS):
+    """
+    Server-sent events for a bus topic.
+
+    encode(event) frames a bus event. initial() and poll() return a frame
+    (or None): initial once before live events, poll whenever the bus has
+    been quiet for poll_seconds. Both are blocking callables run in the
+    threadpool; poll may also be a coroutine function (e.g. one sharing a
+    SingleFlight read between viewers).
+    """
+    subscription = bus.subscribe(topic, policy, key)
+    try:
+        if initial is not None:
+            frame = await run_in_threadpool(initial)
+            if frame:
+                yield frame
+        timeout = poll_seconds if poll is not None else heartbeat_seconds
+        last_sent = time.monotonic()
+        while True:
+            try:
+                data = await asyncio.wait_for(subscription.get(), timeout=timeout)
+                yield encode(data)
+                last_sent = time.monotonic()
+                continue
+            except asyncio.TimeoutError:
+                pass
+            if poll is None:
+                frame = None
+            elif asyncio.iscoroutinefunction(poll):
+                frame = await poll()
+            else:
+                frame = await run_in_threadpool(poll)
+            if frame:
+                yield frame
+                last_sent = time.monotonic()
+            elif time.monotonic() - last_sent >= heartbeat_seconds:
+                yield SSE_HEARTBEAT
+                last_sent = time.monotonic()
+    except Exception as e:
+        logger.error(f"Stream error on {topic}: {e}")
+    finally:
+        bus.unsubscribe(topic, subscription)
+
+
+# ============= COMPRESSION =============
+
+def _choose_encoding(accept_encoding):
+    offered = {}
+    for part in (accept_encoding or "").lower().split(","):
+        name, _, params = part.strip().partition(";")
+        quality = 1.0
+        if params.strip().startswith("q="):
+            try:
+                quality = float(params.strip()[2:])
+            except ValueError:
+                quality = 0.0
+        offered[name.strip()] = quality
+    if brotli is not None and offered.get("br", 0) > 0:
+        return "br"
+    if offered.get("gzip", 0) > 0:
+        return "gzip"
+    return None
+
+
+def _compressor(encoding):
+    if encoding == "br":
+        compressor = brotli.Compressor(quality=5)
+        return compressor.process, compressor.finish
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    return compressor.compress, compressor.flush
+
+
+def _compressed(head, chunks, encoding):
+    compress, finish = _compressor(encoding)
+    for chunk in head:
+        output = compress(chunk)
+        if output:
+            yield output
+    for chunk in chunks:
+        output = compress(chunk)
+        if output:
+            yield output
+    yield finish()
+
+
+def _prefetch(chunks, limit):
+    head, size = [], 0
+    for chunk in chunks:
+        head.append(chunk)
+        size += len(chunk)
+        if size >= limit:
+            return head, False
+    return head, True
+
+
+async def streamed_response(request, chunks, media_type="application/json", min_size=COMPRESS_MIN_BYTES):
+    """
+    Stream chunks (a blocking iterator, run in the threadpool) to the client.
+
+    Enough of the body is read up front to know whether it crosses min_size:
+    small bodies are sent as a plain response, larger ones are streamed and
+    compressed when the client accepts it.
+    """
+    chunks = iter(chunks)
+    head, finished = await run_in_threadpool(_prefetch, chunks, min_size)
+    if finished:
+        return Response(b"".join(head), media_type=media_type)
+
+    headers = {"Vary": "Accept-Encoding"}
+    encoding = _choose_encoding(request.headers.get("accept-encoding"))
+    if encoding is None:
+        body = _chain(head, chunks)
+    else:
+        headers["Content-Encoding"] = encoding
+        body = _compressed(head, chunks, encoding)
+    return StreamingResponse(body, media_type=media_type, headers=headers)
+
+
+def _chain(head, chunks):
+    yield from head
+    yield from chunks
@@ -0,0 +1,129 @@
+import pytest
+
+from ingest_codec import (
+    STRUCT_CONTENT_TYPE, UnsupportedPayloadFormat, decode_device_body, decode_device_payload, decode_reading,
+    decode_reading_body, encode_device_payload, encode_reading, payload_format,
+)
+
+READING = {
+    "device_id": "esp32-cpr-001",
+    "compression_rate": 110.5,
+    "compression_depth": 5.2,
+    "pressure": 0.8,
+    "acceleration_x": -0.1,
+    "acceleration_y": 0.0,
+    "acceleration_z": 9.81,
+    "proximity": 3.0,
+    "quality_score": 0.9,
+}
+
+
+# ============= LEGACY READING =============
+
+def test_reading_round_trip_without_optional_fields():
+    payload = encode_reading(READING)
+    assert len(payload) == 3 + len(READING["device_id"]) + 32
+    assert decode_reading(payload) == READING
+
+
+@pytest.mark.parametrize("optional", [
+    {"temperature": 21.5},
+    {"humidity": 40.0, "altitude": 120.25},
+    {"gesture": -1},
+    {"sos_triggered": False},
+    {"temperature": 21.5, "humidity": 40.0, "altitude": 120.25, "gesture": 3, "sos_triggered": True},
+])
+def test_reading_round_trip_with_optional_fields(optional):
+    reading = {**READING, **optional}
+    assert decode_reading(encode_reading(reading)) == reading
+
+
+def test_reading_rejects_trailing_bytes_and_truncation():
+    payload = encode_reading(READING)
+    with pytest.raises(ValueError, match="trailing bytes"):
+        decode_reading(payload + b"\x00")
+    with pytest.raises(ValueError, match="Malformed"):
+        decode_reading(payload[:-1])
+
+
+def test_reading_rejects_unknown_version():
+    payload = encode_reading(READING)
+    with pytest.raises(ValueError, match="version"):
+        decode_reading(b"\x02" + payload[1:])
+
+
+def test_reading_rejects_long_device_id():
+    with pytest.raises(ValueError):
+        encode_reading({**READING, "device_id": "x" * 256})
+
+
+# ============= DEVICE PAYLOAD =============
+
+def test_device_payload_round_trip():
+    data = {
+        "cpr": {"compression_rate": 104.0, "compression_depth": 5.5, "quality_score": 0.75},
+        "environment": {"temperature": 22.5, "humidity": 45.0, "pressure": 1013.25, "altitude": 12.5},
+        "gesture": {"gesture_type": "left", "proximity": 2.5},
+        "status": {"battery_level": 87, "wifi_signal": -61, "sos_triggered": True},
+    }
+    assert decode_device_payload(encode_device_payload(data)) == data
+
+
+def test_device_payload_with_some_sections():
+    data = {"status": {"battery_level": 50, "wifi_signal": -70, "sos_triggered": False}}
+    payload = encode_device_payload(data)
+    assert len(payload) == 2 + 3
+    assert decode_device_payload(payload) == data
+
+
+def test_device_payload_defaults_and_unknown_gesture():
+    decoded = decode_device_payload(encode_device_payload({"gesture": {"gesture_type": "wave"}, "status": {}}))
+    assert decoded["gesture"] == {"gesture_type": "none", "proximity": 0.0}
+    assert decoded["status"] == {"battery_level": 100, "wifi_signal": 0, "sos_triggered": False}
+
+
+def test_device_payload_rejects_trailing_bytes_truncation_and_version():
+    payload = encode_device_payload({"cpr": {"compression_rate": 100.0}})
+    with pytest.raises(ValueError, match="trailing bytes"):
+        decode_device_payload(payload + b"\x00")
+    with pytest.raises(ValueError, match="Malformed"):
+        decode_device_payload(payload[:-1])
+    with pytest.raises(ValueError, match="version"):
+        decode_device_payload(b"\x09" + payload[1:])
+
+
+# ============= CONTENT NEGOTIATION =============
+
+def test_payload_format():
+    assert payload_format(None) == "json"
+    assert payload_format("application/json; charset=utf-8") == "json"
+    assert payload_format(STRUCT_CONTENT_TYPE) == "struct"
+    with pytest.raises(UnsupportedPayloadFormat):
+        payload_format("text/plain")
+
+
+def test_json_bodies():
+    assert decode_reading_body(b'{"device_id": "d1"}', "application/json") == b'{"device_id": "d1"}'
+    assert decode_device_body(b'{"cpr": {}}', None) == {"cpr": {}}
+    with pytest.raises(ValueError):
+        decode_device_body(b"[1, 2]", "application/json")
+
+
+def test_msgpack_map_and_positional_array():
+    msgpack = pytest.importorskip("msgpack")
+    assert decode_reading_body(msgpack.packb(READING), "application/msgpack") == READING
+    positional = [READING[name] for name in READING] + [21.5]
+    assert decode_reading_body(msgpack.packb(positional), "application/x-msgpack") == {**READING, "temperature": 21.5}
+    assert decode_device_body(msgpack.packb({"cpr": {"compression_rate": 1}}), "application/msgpack") == {
+        "cpr": {"compression_rate": 1},
+    }
+
+
+def test_msgpack_rejects_bad_payloads():
+    msgpack = pytest.importorskip("msgpack")
+    with pytest.raises(ValueError, match="Too many fields"):
+        decode_reading_body(msgpack.packb(list(range(15))), "application/msgpack")
+    with pytest.raises(ValueError, match="must be a map"):
+        decode_device_body(msgpack.packb([1, 2]), "application/msgpack")
+    with pytest.raises(ValueError, match="Malformed"):
+        decode_reading_body(b"\xc1", "application/msgpack")
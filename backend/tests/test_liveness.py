@@ -0,0 +1,94 @@
+import pytest
+
+from liveness import SLOTS, LivenessTracker
+
+
+def offline_at(tracker, start, until):
+    """Advance one second at a time; returns {device_id: second it went offline}"""
+    went_offline = {}
+    for now in range(start + 1, until + 1):
+        for device_id, _ in tracker.advance(now=now):
+            went_offline[device_id] = now
+    return went_offline
+
+
+# ============= TIMEOUTS =============
+
+@pytest.mark.parametrize("timeout", [1, 5, SLOTS - 1, SLOTS, SLOTS + 1, 2 * SLOTS, 200, 10 * SLOTS])
+@pytest.mark.parametrize("start", [0, 10, SLOTS - 1, SLOTS, 1000])
+def test_device_goes_offline_exactly_at_its_timeout(timeout, start):
+    tracker = LivenessTracker(timeout_seconds=timeout, now=start)
+    assert tracker.seen("d1", now=start)
+    assert offline_at(tracker, start, start + timeout + SLOTS) == {"d1": start + timeout}
+    assert not tracker.is_online("d1")
+    assert len(tracker) == 0
+
+
+def test_offline_reports_last_seen():
+    tracker = LivenessTracker(timeout_seconds=10, now=0)
+    tracker.seen("d1", now=0.5)
+    assert tracker.advance(now=10) == []
+    assert tracker.advance(now=11) == [("d1", 0.5)]
+
+
+def test_timeout_is_clamped_to_the_outer_wheel():
+    tracker = LivenessTracker(timeout_seconds=10 ** 6, now=0)
+    assert tracker.timeout == SLOTS * (SLOTS - 1)
+    tracker.seen("d1", now=0)
+    assert tracker.advance(now=tracker.timeout - 1) == []
+    assert tracker.advance(now=tracker.timeout) == [("d1", 0)]
+
+
+# ============= RE-FILING =============
+
+@pytest.mark.parametrize("timeout", [5, 30, SLOTS, 150])
+def test_device_that_reported_again_is_refiled(timeout):
+    tracker = LivenessTracker(timeout_seconds=timeout, now=0)
+    tracker.seen("d1", now=0)
+    assert offline_at(tracker, 0, timeout - 1) == {}
+    assert not tracker.seen("d1", now=timeout - 1)
+    # Its original slot comes due but the new deadline has not passed
+    assert offline_at(tracker, timeout - 1, 2 * timeout - 2) == {}
+    assert tracker.is_online("d1")
+    assert offline_at(tracker, 2 * timeout - 2, 3 * timeout) == {"d1": 2 * timeout - 1}
+
+
+def test_device_kept_alive_across_many_slots():
+    tracker = LivenessTracker(timeout_seconds=3, now=0)
+    tracker.seen("d1", now=0)
+    for now in range(1, 5 * SLOTS):
+        tracker.seen("d1", now=now)
+        assert tracker.advance(now=now) == []
+    assert tracker.advance(now=5 * SLOTS + 2) == [("d1", 5 * SLOTS - 1)]
+
+
+def test_device_coming_back_after_going_offline():
+    tracker = LivenessTracker(timeout_seconds=5, now=0)
+    tracker.seen("d1", now=0)
+    assert tracker.advance(now=5) == [("d1", 0)]
+    assert tracker.seen("d1", now=7)
+    assert offline_at(tracker, 7, 20) == {"d1": 12}
+
+
+# ============= LONG GAPS =============
+
+def test_advance_over_a_long_gap():
+    tracker = LivenessTracker(timeout_seconds=100, now=0)
+    tracker.seen("early", now=0)
+    tracker.seen("late", now=50)
+    tracker.seen("slow", now=0)
+    tracker.seen("slow", now=3000)
+    # One call moves through many full turns of both wheels
+    offline = tracker.advance(now=3050)
+    assert sorted(offline) == [("early", 0), ("late", 50)]
+    assert tracker.is_online("slow")
+    assert tracker.advance(now=3099) == []
+    assert tracker.advance(now=3100) == [("slow", 3000)]
+
+
+def test_advance_is_idempotent_and_ignores_the_past():
+    tracker = LivenessTracker(timeout_seconds=5, now=100)
+    tracker.seen("d1", now=100)
+    assert tracker.advance(now=50) == []
+    assert tracker.advance(now=105) == [("d1", 100)]
+    assert tracker.advance(now=105) == []
@@ -0,0 +1,179 @@
+import asyncio
+import json
+
+import pytest
+
+from spool import (
+    InvalidPath, Spool, SpoolFull, SpoolReplayer, _RECORD_HEADER, check_paths, drain_orphan, is_poison,
+    merge_updates,
+)
+
+
+class Rejected(Exception):
+    """Stand-in for firebase_admin's InvalidArgumentError"""
+    code = "INVALID_ARGUMENT"
+
+
+def open_spool(tmp_path, **kwargs):
+    spool = Spool(tmp_path, **kwargs)
+    spool.open()
+    return spool
+
+
+def replay(spool, write):
+    replayer = SpoolReplayer(spool, write)
+    asyncio.run(replayer.drain(timeout=5))
+    return replayer
+
+
+# ============= LOG =============
+
+def test_reopen_keeps_unreplayed_writes_and_cursor(tmp_path):
+    spool = open_spool(tmp_path)
+    for n in range(3):
+        spool.append({f"readings/{n}": n})
+    records = spool.read_batch(1)
+    spool.commit(records[-1][1], 1)
+    spool.close()
+
+    spool = open_spool(tmp_path)
+    assert spool.pending == 2
+    assert [updates for updates, _ in spool.read_batch(10)] == [{"readings/1": 1}, {"readings/2": 2}]
+    spool.append({"readings/3": 3})
+    assert spool.pending == 3
+    spool.close()
+
+
+def test_rollover_spans_segments_and_drops_replayed_ones(tmp_path):
+    spool = open_spool(tmp_path, segment_bytes=256, max_segments=8)
+    for n in range(20):
+        spool.append({f"readings/{n}": "x" * 20})
+    assert len(spool._segments()) > 1
+
+    records = spool.read_batch(100)
+    assert [next(iter(updates)) for updates, _ in records] == [f"readings/{n}" for n in range(20)]
+    spool.commit(records[-1][1], len(records))
+    assert spool.pending == 0
+    assert spool._segments() == [records[-1][1][0]]
+    spool.close()
+
+
+def test_full_spool_raises(tmp_path):
+    spool = open_spool(tmp_path, segment_bytes=128, max_segments=2)
+    with pytest.raises(SpoolFull):
+        for n in range(100):
+            spool.append({f"readings/{n}": "x" * 20})
+    with pytest.raises(ValueError):
+        spool.append({"readings/big": "x" * 200})
+    spool.close()
+
+
+def test_torn_write_ends_the_log(tmp_path):
+    spool = open_spool(tmp_path)
+    spool.append({"readings/1": 1})
+    spool.append({"readings/2": 2})
+    # Corrupt the second record's checksum as a crash mid-write would
+    offset = _RECORD_HEADER.size + len(json.dumps({"readings/1": 1}, separators=(",", ":")))
+    length, checksum = _RECORD_HEADER.unpack(spool._map[offset:offset + _RECORD_HEADER.size])
+    spool._map[offset:offset + _RECORD_HEADER.size] = _RECORD_HEADER.pack(length, checksum ^ 1)
+    spool.close()
+
+    spool = open_spool(tmp_path)
+    assert spool.pending == 1
+    spool.append({"readings/3": 3})
+    assert [updates for updates, _ in spool.read_batch(10)] == [{"readings/1": 1}, {"readings/3": 3}]
+    spool.close()
+
+
+def test_unclaimed_slots_are_adopted_and_drained(tmp_path):
+    # Four workers spooled writes; the pool then shrank to one
+    workers = [open_spool(tmp_path) for _ in range(4)]
+    for n, worker in enumerate(workers):
+        worker.append({f"readings/{n}": n})
+    for worker in workers:
+        worker.close()
+
+    spool = open_spool(tmp_path)
+    busy = open_spool(tmp_path)     # slot 1 is claimed by a running worker
+    orphans = spool.adopt_orphans()
+    assert [orphan.directory.name for orphan in orphans] == ["slot-2", "slot-3"]
+
+    written = {}
+    for orphan in orphans:
+        asyncio.run(drain_orphan(orphan, written.update))
+    assert written == {"readings/2": 2, "readings/3": 3}
+    assert spool.adopt_orphans() == []
+    busy.close()
+    spool.close()
+
+
+# ============= MERGING =============
+
+def test_merge_later_writes_win():
+    assert merge_updates([{"a/b": 1, "a/c": 2}, {"a/b": 3}]) == [{"a/b": 3, "a/c": 2}]
+
+
+def test_merge_splits_ancestor_and_descendant_paths():
+    assert merge_updates([{"devices/d1/cpr": 1}, {"devices/d1": {"name": "x"}}]) == [
+        {"devices/d1/cpr": 1}, {"devices/d1": {"name": "x"}},
+    ]
+    assert merge_updates([{"devices/d1": 1}, {"/devices/d1/cpr/": 2}, {"devices/d2": 3}]) == [
+        {"devices/d1": 1}, {"devices/d1/cpr": 2, "devices/d2": 3},
+    ]
+
+
+# ============= POISON WRITES =============
+
+def test_check_paths():
+    check_paths({"sensor_by_device/d-1/-Nabc": {}, "/devices/d_2/cpr/": {}})
+    for path in ("sensor_by_device/d.bad/x", "devices/a$b", "devices//cpr", "devices/a[0]", "devices/\x01"):
+        with pytest.raises(InvalidPath):
+            check_paths({path: 1})
+
+
+def test_is_poison():
+    assert is_poison(InvalidPath("Invalid Firebase path"))
+    assert is_poison(Rejected())
+    assert not is_poison(ValueError("Invalid service account certificate"))
+    assert not is_poison(ConnectionError("unreachable"))
+    assert not is_poison(TimeoutError())
+
+
+def test_poison_write_is_dead_lettered_and_unblocks_the_queue(tmp_path):
+    spool = open_spool(tmp_path)
+    spool.append({"sensor_by_device/d1/a": 1})
+    spool.append({"sensor_by_device/d.bad/b": 2})
+    spool.append({"sensor_by_device/d2/c": 3})
+    written = {}
+
+    def write(updates):
+        if any("." in path for path in updates):
+            raise Rejected("Invalid key")
+        written.update(updates)
+
+    replayer = replay(spool, write)
+    assert written == {"sensor_by_device/d1/a": 1, "sensor_by_device/d2/c": 3}
+    assert replayer.replayed == 2
+    assert spool.pending == 0
+    assert spool.dead_lettered == 1
+    (entry,) = (spool.directory / "dead-letter.ndjson").read_text().splitlines()
+    assert json.loads(entry)["updates"] == {"sensor_by_device/d.bad/b": 2}
+    spool.close()
+
+    assert open_spool(tmp_path).pending == 0
+
+
+def test_transient_failure_keeps_writes_queued(tmp_path):
+    spool = open_spool(tmp_path)
+    spool.append({"readings/1": 1})
+
+    def write(updates):
+        raise ConnectionError("unreachable")
+
+    replayer = replay(spool, write)
+    assert replayer.replayed == 0
+    assert spool.pending == 1
+    assert spool.dead_lettered == 0
+    assert not (spool.directory / "dead-letter.ndjson").exists()
+    spool.close()
+
@@ -13,6 +13,7 @@ from datetime import datetime
 # Configuration
 BACKEND_URL = "http://localhost:8000/api"
 DEVICE_ID = "esp32-cpr-simulator"
+DEFAULT_INTERVAL = 0.1  # seconds, until the backend recommends another interval
 
 def generate_sensor_data():
     """Generate realistic CPR sensor data"""
@@ -81,7 +82,7 @@ def calculate_quality_score(rate, depth, pressure):
     return (rate_score + depth_score + pressure_score) / 3.0
 
 def send_sensor_data(data):
-    """Send sensor data to backend"""
+    """Send sensor data to backend; returns the number of seconds to wait before the next send"""
     try:
         url = f"{BACKEND_URL}/iot/sensor-data"
         headers = {'Content-Type': 'application/json'}
@@ -89,30 +90,38 @@ def send_sensor_data(data):
         response = requests.post(url, json=data, headers=headers, timeout=5)
 
         if response.status_code == 200:
+            ack = response.json()
             print(f"✅ Data sent successfully: {data}")
-            return True
+            feedback = ack.get("feedback") or {}
+            if feedback.get("cues"):
+                print(f"📣 Coaching: {', '.join(feedback['cues'])}")
+            return ack.get("next_interval_ms", DEFAULT_INTERVAL * 1000) / 1000.0
+        elif response.status_code == 429:
+            retry_after = float(response.headers.get("Retry-After", 1))
+            print(f"⏳ Rate limited, retrying in {retry_after}s")
+            return retry_after
         else:
             print(f"❌ Failed to send data: {response.status_code} - {response.text}")
-            return False
+            return DEFAULT_INTERVAL
 
     except requests.exceptions.RequestException as e:
         print(f"❌ Connection error: {e}")
-        return False
+        return DEFAULT_INTERVAL
 
 def main():
     print("🚀 ResqPulse ESP32 Sensor Data Simulator")
     print("=" * 50)
     print(f"Backend URL: {BACKEND_URL}")
     print(f"Device ID: {DEVICE_ID}")
-    print("Sending sensor data every 100ms...")
+    print("Sending sensor data at the interval recommended by the backend (100ms to start)...")
     print("Press Ctrl+C to stop")
     print()
 
     try:
         while True:
             sensor_data = generate_sensor_data()
-            send_sensor_data(sensor_data)
-            time.sleep(0.1)  # 100ms delay
+            interval = send_sensor_data(sensor_data)
+            time.sleep(interval)
 
     except KeyboardInterrupt:
         print("\n🛑 Simulator stopped by user")
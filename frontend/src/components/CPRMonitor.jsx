@@ -1,8 +1,9 @@
 import { useState, useEffect } from 'react'
-import { getDatabase, ref, onValue, off } from 'firebase/database'
+import { getDatabase } from 'firebase/database'
 import { Card, CardContent, CardHeader, CardTitle } from './ui/card'
 import { Badge } from './ui/badge'
 import { Activity, Thermometer, Droplets, Mountain, Hand, Zap } from 'lucide-react'
+import { watchDeviceSection } from '../utils/devicePath'
 
 const CPRMonitor = ({ deviceId = 'esp32-cpr-001' }) => {
   const [cprData, setCprData] = useState({
@@ -40,32 +41,28 @@ const CPRMonitor = ({ deviceId = 'esp32-cpr-001' }) => {
     const db = getDatabase()
 
     // Listen to CPR data
-    const cprRef = ref(db, `devices/${deviceId}/cpr`)
-    const cprUnsubscribe = onValue(cprRef, (snapshot) => {
+    const cprUnsubscribe = watchDeviceSection(db, deviceId, 'cpr', (snapshot) => {
       if (snapshot.exists()) {
         setCprData(snapshot.val())
       }
     })
 
     // Listen to environment data
-    const envRef = ref(db, `devices/${deviceId}/environment`)
-    const envUnsubscribe = onValue(envRef, (snapshot) => {
+    const envUnsubscribe = watchDeviceSection(db, deviceId, 'environment', (snapshot) => {
       if (snapshot.exists()) {
         setEnvironmentData(snapshot.val())
       }
     })
 
     // Listen to gesture data
-    const gestureRef = ref(db, `devices/${deviceId}/gesture`)
-    const gestureUnsubscribe = onValue(gestureRef, (snapshot) => {
+    const gestureUnsubscribe = watchDeviceSection(db, deviceId, 'gesture', (snapshot) => {
       if (snapshot.exists()) {
         setGestureData(snapshot.val())
       }
     })
 
     // Listen to status data
-    const statusRef = ref(db, `devices/${deviceId}/status`)
-    const statusUnsubscribe = onValue(statusRef, (snapshot) => {
+    const statusUnsubscribe = watchDeviceSection(db, deviceId, 'status', (snapshot) => {
       if (snapshot.exists()) {
         setStatusData(snapshot.val())
       }
@@ -73,10 +70,10 @@ const CPRMonitor = ({ deviceId = 'esp32-cpr-001' }) => {
 
     // Cleanup listeners
     return () => {
-      off(cprRef, 'value', cprUnsubscribe)
-      off(envRef, 'value', envUnsubscribe)
-      off(gestureRef, 'value', gestureUnsubscribe)
-      off(statusRef, 'value', statusUnsubscribe)
+      cprUnsubscribe()
+      envUnsubscribe()
+      gestureUnsubscribe()
+      statusUnsubscribe()
     }
   }, [deviceId])
 
@@ -1,8 +1,9 @@
 import { useState, useEffect } from 'react'
-import { getDatabase, ref, onValue, off } from 'firebase/database'
+import { getDatabase } from 'firebase/database'
 import { Card, CardContent, CardHeader, CardTitle } from './ui/card'
 import { LineChart, Line, XAxis, YAxis, CartesianGrid, Tooltip, ResponsiveContainer } from 'recharts'
 import { Thermometer, Droplets, Mountain, Gauge } from 'lucide-react'
+import { watchDeviceSection } from '../utils/devicePath'
 
 const EnvironmentalMonitor = ({ deviceId = 'esp32-cpr-001' }) => {
   const [envHistory, setEnvHistory] = useState([])
@@ -16,9 +17,7 @@ const EnvironmentalMonitor = ({ deviceId = 'esp32-cpr-001' }) => {
 
   useEffect(() => {
     const db = getDatabase()
-    const envRef = ref(db, `devices/${deviceId}/environment`)
-
-    const unsubscribe = onValue(envRef, (snapshot) => {
+    const unsubscribe = watchDeviceSection(db, deviceId, 'environment', (snapshot) => {
       if (snapshot.exists()) {
         const data = snapshot.val()
         setCurrentData(data)
@@ -37,7 +36,7 @@ const EnvironmentalMonitor = ({ deviceId = 'esp32-cpr-001' }) => {
       }
     })
 
-    return () => off(envRef, 'value', unsubscribe)
+    return unsubscribe
   }, [deviceId])
 
   return (
@@ -1,9 +1,10 @@
 import { useState, useEffect } from 'react'
-import { getDatabase, ref, onValue, off } from 'firebase/database'
+import { getDatabase } from 'firebase/database'
 import { Card, CardContent, CardHeader, CardTitle } from './ui/card'
 import { Badge } from './ui/badge'
 import { Alert, AlertDescription } from './ui/alert'
 import { Hand, AlertTriangle, Activity } from 'lucide-react'
+import { watchDeviceSection } from '../utils/devicePath'
 
 const GestureMonitor = ({ deviceId = 'esp32-cpr-001' }) => {
   const [gestureData, setGestureData] = useState({
@@ -17,9 +18,7 @@ const GestureMonitor = ({ deviceId = 'esp32-cpr-001' }) => {
 
   useEffect(() => {
     const db = getDatabase()
-    const gestureRef = ref(db, `devices/${deviceId}/gesture`)
-
-    const unsubscribe = onValue(gestureRef, (snapshot) => {
+    const unsubscribe = watchDeviceSection(db, deviceId, 'gesture', (snapshot) => {
       if (snapshot.exists()) {
         const data = snapshot.val()
         setGestureData(data)
@@ -37,7 +36,7 @@ const GestureMonitor = ({ deviceId = 'esp32-cpr-001' }) => {
       }
     })
 
-    return () => off(gestureRef, 'value', unsubscribe)
+    return unsubscribe
   }, [deviceId])
 
   const getGestureName = (gesture) => {
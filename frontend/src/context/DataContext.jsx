@@ -3,6 +3,7 @@ import { getDatabase, ref, onValue, off } from 'firebase/database'
 import { initializeApp } from 'firebase/app'
 import { getAuth } from 'firebase/auth'
 import { useAuth } from './AuthContext'
+import { watchDeviceSection, watchLatestReading } from '../utils/devicePath'
 
 const DataContext = createContext()
 
@@ -61,8 +62,7 @@ export const DataProvider = ({ children }) => {
 
     try {
       // CPR data
-      const cprRef = ref(database, `devices/${deviceId}/cpr`)
-      const cprUnsubscribe = onValue(cprRef, (snapshot) => {
+      const cprUnsubscribe = watchDeviceSection(database, deviceId, 'cpr', (snapshot) => {
         const data = snapshot.val()
         setDeviceData(prev => ({
           ...prev,
@@ -74,8 +74,7 @@ export const DataProvider = ({ children }) => {
       })
 
       // Environment data
-      const envRef = ref(database, `devices/${deviceId}/environment`)
-      const envUnsubscribe = onValue(envRef, (snapshot) => {
+      const envUnsubscribe = watchDeviceSection(database, deviceId, 'environment', (snapshot) => {
         const data = snapshot.val()
         setDeviceData(prev => ({
           ...prev,
@@ -87,8 +86,7 @@ export const DataProvider = ({ children }) => {
       })
 
       // Gesture data
-      const gestureRef = ref(database, `devices/${deviceId}/gesture`)
-      const gestureUnsubscribe = onValue(gestureRef, (snapshot) => {
+      const gestureUnsubscribe = watchDeviceSection(database, deviceId, 'gesture', (snapshot) => {
         const data = snapshot.val()
         setDeviceData(prev => ({
           ...prev,
@@ -100,8 +98,7 @@ export const DataProvider = ({ children }) => {
       })
 
       // Status data
-      const statusRef = ref(database, `devices/${deviceId}/status`)
-      const statusUnsubscribe = onValue(statusRef, (snapshot) => {
+      const statusUnsubscribe = watchDeviceSection(database, deviceId, 'status', (snapshot) => {
         const data = snapshot.val()
         setDeviceData(prev => ({
           ...prev,
@@ -113,22 +110,24 @@ export const DataProvider = ({ children }) => {
       })
 
       return () => {
-        off(cprRef, 'value', cprUnsubscribe)
-        off(envRef, 'value', envUnsubscribe)
-        off(gestureRef, 'value', gestureUnsubscribe)
-        off(statusRef, 'value', statusUnsubscribe)
+        cprUnsubscribe()
+        envUnsubscribe()
+        gestureUnsubscribe()
+        statusUnsubscribe()
       }
     } catch (error) {
       console.error('Error setting up device listeners:', error)
     }
   }, [currentUser])
 
-  // Legacy sensor data listener (for backward compatibility)
+  // Latest stored reading of the default device (its sensor_by_device index,
+  // which every shard layout writes, unlike the legacy sensor_data log)
   useEffect(() => {
     try {
-      const sensorRef = ref(database, 'sensor_data')
-      const unsubscribe = onValue(
-        sensorRef,
+      const deviceId = 'esp32-cpr-001' // Default device
+      const unsubscribe = watchLatestReading(
+        database,
+        deviceId,
         (snapshot) => {
           const data = snapshot.val()
           if (data) {
@@ -147,7 +146,7 @@ export const DataProvider = ({ children }) => {
         }
       )
 
-      return () => off(sensorRef)
+      return unsubscribe
     } catch (error) {
       // Error subscribing to sensor data - silently handle
     }
@@ -0,0 +1,87 @@
+// Realtime Database location of a device, following the backend's SHARD_LAYOUT
+// (see backend/layout.py). Set VITE_SHARD_LAYOUT and VITE_SHARD_BUCKETS to the
+// backend's SHARD_LAYOUT and SHARD_BUCKETS.
+
+import { get, limitToLast, onValue, orderByKey, query, ref } from 'firebase/database'
+
+const SHARD_LAYOUT = (import.meta.env.VITE_SHARD_LAYOUT || 'flat').trim().toLowerCase()
+const SHARD_BUCKETS = parseInt(import.meta.env.VITE_SHARD_BUCKETS || '64', 10)
+const UNASSIGNED = '_unassigned'
+
+const CRC_TABLE = Array.from({ length: 256 }, (_, n) => {
+  let c = n
+  for (let k = 0; k < 8; k++) c = c & 1 ? 0xedb88320 ^ (c >>> 1) : c >>> 1
+  return c >>> 0
+})
+
+// Same checksum as Python's zlib.crc32 over the UTF-8 bytes
+const crc32 = (text) => {
+  let crc = 0xffffffff
+  for (const byte of new TextEncoder().encode(text)) {
+    crc = CRC_TABLE[(crc ^ byte) & 0xff] ^ (crc >>> 8)
+  }
+  return (crc ^ 0xffffffff) >>> 0
+}
+
+export const bucketName = (key, buckets = SHARD_BUCKETS) => {
+  const width = (buckets - 1).toString(16).length
+  return `h${(crc32(String(key)) % buckets).toString(16).padStart(width, '0')}`
+}
+
+const byOrg = SHARD_LAYOUT === 'org' || SHARD_LAYOUT === 'org+hash'
+const byHash = SHARD_LAYOUT === 'hash' || SHARD_LAYOUT === 'org+hash'
+
+// Shard of a device with no directory entry (firmware-only devices)
+const fallbackShard = (deviceId) => {
+  const parts = []
+  if (byOrg) parts.push(UNASSIGNED)
+  if (byHash) parts.push(bucketName(deviceId))
+  return parts.join('/')
+}
+
+const resolveShard = async (db, deviceId) => {
+  if (SHARD_LAYOUT === 'flat') return null
+  if (byOrg) {
+    // Organization shards are only known from the shard directory
+    const snapshot = await get(ref(db, `shard_directory/devices/${deviceId}`))
+    if (snapshot.exists()) return snapshot.val()
+  }
+  return fallbackShard(deviceId)
+}
+
+const shardPath = (shard, collection, deviceId) =>
+  shard ? `shards/${shard}/${collection}/${deviceId}` : `${collection}/${deviceId}`
+
+export const resolveDevicePath = async (db, deviceId) =>
+  shardPath(await resolveShard(db, deviceId), 'devices', deviceId)
+
+// The device's reading index (sensor_by_device), written in every layout
+export const resolveReadingsPath = async (db, deviceId) =>
+  shardPath(await resolveShard(db, deviceId), 'sensor_by_device', deviceId)
+
+// Subscribe once the path is resolved; returns a function that stops listening
+const watchResolved = (resolvePath, deviceId, subscribe) => {
+  let unsubscribe = null
+  let stopped = false
+  resolvePath
+    .then((path) => {
+      if (!stopped) unsubscribe = subscribe(path)
+    })
+    .catch((error) => console.error(`Error resolving device ${deviceId}:`, error))
+  return () => {
+    stopped = true
+    if (unsubscribe) unsubscribe()
+  }
+}
+
+// Listen to one section (cpr, environment, gesture, status) of a device
+export const watchDeviceSection = (db, deviceId, section, callback) =>
+  watchResolved(resolveDevicePath(db, deviceId), deviceId, (path) =>
+    onValue(ref(db, `${path}/${section}`), callback)
+  )
+
+// Listen to the device's latest stored reading
+export const watchLatestReading = (db, deviceId, callback, onError) =>
+  watchResolved(resolveReadingsPath(db, deviceId), deviceId, (path) =>
+    onValue(query(ref(db, path), orderByKey(), limitToLast(1)), callback, onError)
+  )